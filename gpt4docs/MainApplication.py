@@ -3,7 +3,24 @@ import sys
 import pdoc
 import time
 import os
+import json
 from gpt4docs import ProjectManager, VectorStoreManager, LLMManager
+from gpt4docs.model import LLMBackend, LLMBackendEnum
+from gpt4docs.modules.cache import (
+    CachedEmbeddings,
+    DocstringCache,
+    EmbeddingCache,
+    FormatCache,
+    SummaryCache,
+)
+from gpt4docs.modules.embeddings import EmbeddingsEnum, get_embeddings
+from gpt4docs.modules.journal import DocstringJournal
+from gpt4docs.modules.metrics import RunMetrics
+from gpt4docs.modules.pipeline import ReadmePipeline
+from gpt4docs.modules.policies import DocstringPolicy, DocstringPolicyEnum
+from gpt4docs.modules.retrieval import ContextScopeEnum
+from gpt4docs.modules.scheduling import Scheduler
+from gpt4docs.scripts.build_vectorstore import ChunkerEnum
 from pathlib import Path
 import argparse
 import logging
@@ -16,57 +33,283 @@ pdoc.render.configure(docformat="google")
 class MainApplication:
     def __init__(self, args):
         self._verify_args(args)
-        self._verify_env()
+        self._verify_env(args)
         self.args = args
+        self.metrics = RunMetrics()
+
+        if args.cache_path is None:
+            args.cache_path = args.vectorstore_path.parent / ".gpt4docs_cache"
+        if args.report is None:
+            args.report = args.cache_path / "report.json"
+        # Pipelined runs save each file as soon as its docstrings are done
+        if args.pipeline:
+            args.stream = True
+
+        if args.no_cache:
+            self.docstring_cache = None
+            self.format_cache = None
+            self.summary_cache = None
+            embedding_cache = None
+        else:
+            self.docstring_cache = DocstringCache(
+                args.cache_path / "docstrings.sqlite",
+                max_size=args.cache_size * 1024**2,
+            )
+            self.format_cache = FormatCache(
+                args.cache_path / "formatted.sqlite",
+                max_size=args.cache_size * 1024**2,
+            )
+            self.summary_cache = SummaryCache(
+                args.cache_path / "summaries.sqlite",
+                max_size=args.cache_size * 1024**2,
+            )
+            embedding_cache = EmbeddingCache(
+                args.cache_path / "embeddings.sqlite",
+                max_size=args.cache_size * 1024**2,
+            )
+
+        # Embeddings are kept in memory, and stored in the cache if enabled
+        self.embeddings = CachedEmbeddings(
+            get_embeddings(args.embeddings), store=embedding_cache
+        )
 
         if not args.no_build and not args.no_docstring:
-            VectorStoreManager.build(args.vectorstore_path, args.project_path)
+            with self.metrics.stage("build_vectorstore"):
+                VectorStoreManager.build(
+                    args.vectorstore_path,
+                    args.project_path,
+                    incremental=args.incremental,
+                    embeddings=self.embeddings,
+                    batch_size=args.embedding_batch_size,
+                    concurrency=args.embedding_concurrency,
+                    chunker=args.chunker,
+                )
         else:
             logger.warning(
                 "Not building vectorstore. Any recent changes will not be used to generate documentation. If you want to build the vectorstore, run without `--no-build` argument."  # noqa: E501
             )
 
-        self.project_manager = ProjectManager(args.project_path)
-        self.vector_store_manager = VectorStoreManager(args.vectorstore_path)
-        self.llm_manager = LLMManager(self.vector_store_manager)
+        self.state_path = args.cache_path / "state.json"
+        self.start_time = time.time()
+        changed_only = args.changed_since is not None or args.changed_since_last_run
+
+        # Files are only needed when generating docstrings, and only changed
+        # files if restricted to those. When streaming, each file is loaded
+        # when its docstrings are generated
+        with self.metrics.stage("load_project"):
+            self.project_manager = ProjectManager(
+                args.project_path,
+                workers=args.workers,
+                format_cache=self.format_cache,
+                lazy=args.no_docstring or changed_only or args.stream,
+                metrics=self.metrics,
+            )
+            if not args.no_docstring and changed_only:
+                self.project_manager.select(self.changed_files(), load=not args.stream)
+        # Docstrings are journaled as they arrive, such that an interrupted
+        # run can be resumed
+        self.journal = (
+            DocstringJournal(args.cache_path / "journal.jsonl", resume=args.resume)
+            if not args.no_docstring
+            else None
+        )
+        self.vector_store_manager = VectorStoreManager(
+            args.vectorstore_path, embeddings=self.embeddings
+        )
+        self.llm_manager = LLMManager(
+            self.vector_store_manager,
+            docstring_cache=self.docstring_cache,
+            scheduler=Scheduler(
+                args.concurrency,
+                args.tokens_per_minute,
+                max_retries=args.max_retries,
+                timeout=args.request_timeout,
+            ),
+            policy=DocstringPolicy(
+                args.docstrings, args.min_docstring_length, force=args.force
+            ),
+            batch_size=args.batch_size,
+            context_scope=args.context_scope,
+            context_blend=args.context_blend,
+            llm_backend=LLMBackend(
+                args.llm,
+                base_url=args.llm_base_url,
+                latency=args.llm_latency,
+                responses=self._load_responses(args.llm_responses),
+                rate_limit=args.llm_rate_limit,
+            ),
+            metrics=self.metrics,
+            journal=self.journal,
+            summary_cache=self.summary_cache,
+        )
 
     async def run(self):
+        commented_path = self.args.vectorstore_path.parent / ".vectorstore_commented"
+        pipeline = None
         if not self.args.no_docstring:
-            await self.generate_docstrings()
+            if self.args.pipeline and not self.args.no_readme:
+                pipeline = self.start_pipeline(commented_path)
 
-            new_root = self.project_manager.save()
+            try:
+                with self.metrics.stage("generate_docstrings"):
+                    await self.generate_docstrings(pipeline)
+
+                with self.metrics.stage("save_project"):
+                    new_root = self.project_manager.save()
+                # The docstrings are saved, so there is nothing left to resume
+                self.journal.clear()
+            except BaseException:
+                # Files are not summarized or embedded for a README that is
+                # never written
+                if pipeline is not None:
+                    await pipeline.cancel()
+                raise
+
+            if pipeline is not None:
+                with self.metrics.stage("finish_pipeline"):
+                    await pipeline.join()
         else:
             new_root = self.project_manager.project.project_root
 
         if not self.args.no_readme:
-            VectorStoreManager.build(
-                self.args.vectorstore_path.parent / ".vectorstore_commented", new_root
-            )
+            # Files embedded by the pipeline are already in the vectorstore
+            with self.metrics.stage("build_commented_vectorstore"):
+                VectorStoreManager.build(
+                    commented_path,
+                    new_root,
+                    incremental=self.args.incremental or pipeline is not None,
+                    source_path=self.args.vectorstore_path,
+                    embeddings=self.embeddings,
+                    batch_size=self.args.embedding_batch_size,
+                    concurrency=self.args.embedding_concurrency,
+                    chunker=self.args.chunker,
+                )
             logger.info(f"Saving README.md to {new_root}")
-            await self.generate_readme(new_root)
+            with self.metrics.stage("generate_readme"):
+                await self.generate_readme(
+                    new_root,
+                    VectorStoreManager(commented_path, embeddings=self.embeddings),
+                )
 
         if self.args.compile:
-            self.compile_docs(new_root)
+            with self.metrics.stage("compile_docs"):
+                self.compile_docs(new_root)
+
+        logger.info(f"Embeddings: {self.embeddings.summary()}")
 
+        if not self.args.no_docstring:
+            self.save_last_run()
+
+        self.save_report()
         logger.info("Finished")
 
-    async def generate_docstrings(self):
+    def start_pipeline(self, commented_path: Path) -> ReadmePipeline:
+        """Summarize and embed each file for the README as soon as it is
+        saved, while the docstrings of other files are generated"""
+        pipeline = ReadmePipeline(
+            self.llm_manager.readme_llm,
+            self.project_manager.get_new_root(),
+            commented_path,
+            embeddings=self.embeddings,
+            batch_size=self.args.embedding_batch_size,
+            concurrency=self.args.embedding_concurrency,
+            incremental=self.args.incremental,
+            source_path=self.args.vectorstore_path,
+            chunker=self.args.chunker,
+        )
+        pipeline.start()
+        return pipeline
+
+    def save_report(self):
+        """Write the metrics of the run with its arguments and cache usage"""
+        caches = {"embeddings": self.embeddings.summary()}
+        if self.docstring_cache is not None:
+            caches["docstrings"] = self.docstring_cache.summary()
+        if self.format_cache is not None:
+            caches["formatted"] = self.format_cache.summary()
+        if self.summary_cache is not None:
+            caches["summaries"] = self.summary_cache.summary()
+
+        logger.info(f"Metrics: {self.metrics.summary()}")
+        self.metrics.save(
+            self.args.report,
+            arguments=vars(self.args),
+            caches=caches,
+            context=self.llm_manager.context_retriever.summary(),
+        )
+
+    def changed_files(self):
+        """Files changed since the git ref or the last successful run"""
+        project = self.project_manager.project
+        if self.args.changed_since is not None:
+            logger.info(f"Using files changed since {self.args.changed_since}")
+            return project.changed_since_ref(self.args.changed_since)
+
+        last_run = self.load_state().get(self._state_key())
+        if last_run is None:
+            logger.info("No previous run found, using all files")
+            return project.files.keys()
+
+        logger.info(f"Using files changed since last run at {time.ctime(last_run)}")
+        return project.changed_since_time(last_run)
+
+    def load_state(self):
+        if not self.state_path.exists():
+            return {}
+        return json.loads(self.state_path.read_text())
+
+    def save_last_run(self):
+        """Record the start of this run, such that files changed while it ran
+        are included in the next run"""
+        state = self.load_state()
+        state[self._state_key()] = self.start_time
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        self.state_path.write_text(json.dumps(state, indent=2))
+
+    def _load_responses(self, path):
+        """Responses of the fake LLM backend, as a JSON list of strings"""
+        if path is None:
+            return None
+        return json.loads(Path(path).read_text())
+
+    def _state_key(self):
+        return str(self.args.project_path.resolve())
+
+    async def generate_docstrings(self, pipeline: ReadmePipeline | None = None):
         """Generate docstrings using LLM"""
         start = time.time()
         logger.info("Generating docstrings")
+
+        # When streaming, each file is saved as soon as its docstrings are done,
+        # and passed on to the pipeline if given
+        def on_file_done(file):
+            path = self.project_manager.save_file(file)
+            if pipeline is not None:
+                pipeline.add(path)
+
         file_docstrings = await self.llm_manager.generate_docstrings(
-            self.project_manager.get_files()
+            self.project_manager.get_files(),
+            on_file_done=on_file_done if self.args.stream else None,
         )
         self.project_manager.update_docstrings(file_docstrings)
         logger.info(
             f"Finished generating docstrings. Time spent: {time.time() - start:.2f}s"
         )
 
-    async def generate_readme(self, project_dir: str | Path):
+        if self.docstring_cache is not None:
+            logger.info(f"Docstring cache: {self.docstring_cache.summary()}")
+
+    async def generate_readme(
+        self,
+        project_dir: str | Path,
+        vectorstore_manager: VectorStoreManager | None = None,
+    ):
         """Generate README.md using LLM"""
         start = time.time()
         logger.info("Generating README.md (may take a while)")
-        readme = await self.llm_manager.generate_readme()
+        readme = await self.llm_manager.generate_readme(
+            project_dir, vectorstore_manager
+        )
         self.project_manager.add_readme(readme, project_dir)
         logger.info(
             f"Finished generating README. Time spent: {time.time() - start:.2f}s"
@@ -86,14 +329,23 @@ class MainApplication:
         if not args.project_path.exists():
             raise ValueError(f"Project path {args.project_path} does not exist")
 
+        if args.changed_since is not None and args.changed_since_last_run:
+            raise ValueError(
+                "Use either `--changed-since` or `--changed-since-last-run`, not both"
+            )
+
         if args.no_build and not VectorStoreManager.is_built(args.vectorstore_path):
             raise ValueError(
                 "Vectorstore is not built. Run module without `--no-build` argument. "
                 "`python3 -m gpt4docs --no-build ..."
             )
 
-    def _verify_env(self):
-        if os.getenv("OPENAI_API_KEY") is None:
+    def _verify_env(self, args):
+        # Local backends and OpenAI compatible servers do not need a key
+        uses_openai = (
+            args.llm == LLMBackendEnum.openai and args.llm_base_url is None
+        ) or args.embeddings == EmbeddingsEnum.openai
+        if uses_openai and os.getenv("OPENAI_API_KEY") is None:
             raise ValueError(
                 "OPENAI_API_KEY environment variable must be set to use LLM"
             )
@@ -118,6 +370,190 @@ class MainApplication:
             action="store_true",
             help="Don't build the vectorstore",
         )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only embed new or changed files when building the vectorstore",
+        )
+        parser.add_argument(
+            "--llm",
+            choices=[backend.value for backend in LLMBackendEnum],
+            default=LLMBackendEnum.openai.value,
+            help="LLM backend: openai, or fake (local templated responses)",
+        )
+        parser.add_argument(
+            "--llm_base_url",
+            default=None,
+            help="Base URL of an OpenAI compatible server for the openai backend",
+        )
+        parser.add_argument(
+            "--llm_latency",
+            type=float,
+            default=0.0,
+            help="Simulated latency in seconds of each fake LLM response",
+        )
+        parser.add_argument(
+            "--llm_responses",
+            type=Path,
+            default=None,
+            help="JSON file with a list of responses the fake LLM replays in turn",
+        )
+        parser.add_argument(
+            "--llm_rate_limit",
+            type=int,
+            default=None,
+            help="Number of requests in flight above which the fake LLM responds "
+            "with rate limit errors",
+        )
+        parser.add_argument(
+            "--embeddings",
+            choices=[backend.value for backend in EmbeddingsEnum],
+            default=EmbeddingsEnum.openai.value,
+            help="Embedding backend: openai, or hashing (local, no network access)",
+        )
+        parser.add_argument(
+            "--chunker",
+            choices=[chunker.value for chunker in ChunkerEnum],
+            default=ChunkerEnum.definition.value,
+            help="Split files into chunks at class and function boundaries "
+            "(definition) or by a fixed number of tokens (token)",
+        )
+        parser.add_argument(
+            "--embedding_batch_size",
+            type=int,
+            default=64,
+            help="Number of chunks embedded per request when building vectorstores",
+        )
+        parser.add_argument(
+            "--embedding_concurrency",
+            type=int,
+            default=4,
+            help="Maximum number of embedding requests in flight when building "
+            "vectorstores",
+        )
+        parser.add_argument(
+            "--cache_path",
+            type=Path,
+            default=None,
+            help="Path to cache directory (default: next to the vectorstore)",
+        )
+        parser.add_argument(
+            "--cache_size",
+            type=int,
+            default=100,
+            help="Maximum size of each cache in MB",
+        )
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="Do not cache generated docstrings, formatted files or embeddings",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=16,
+            help="Maximum number of LLM requests in flight across the project",
+        )
+        parser.add_argument(
+            "--tokens_per_minute",
+            type=int,
+            default=None,
+            help="Maximum number of tokens sent to the LLM per minute",
+        )
+        parser.add_argument(
+            "--max_retries",
+            type=int,
+            default=5,
+            help="Number of times a failed or rate limited LLM request is retried",
+        )
+        parser.add_argument(
+            "--request_timeout",
+            type=float,
+            default=120.0,
+            help="Seconds after which an LLM request is cancelled and retried",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of processes used to load the project (default: CPU count)",
+        )
+        parser.add_argument(
+            "--batch_size",
+            type=int,
+            default=1,
+            help="Maximum number of definitions of the same class or file to "
+            "document in one LLM request",
+        )
+        parser.add_argument(
+            "--context_scope",
+            choices=[scope.value for scope in ContextScopeEnum],
+            default=ContextScopeEnum.definition.value,
+            help="Retrieve context for docstrings once per request (definition), "
+            "class or file",
+        )
+        parser.add_argument(
+            "--context_blend",
+            type=int,
+            default=0,
+            help="Number of documents retrieved for each request in addition to "
+            "the context of its class or file",
+        )
+        parser.add_argument(
+            "--docstrings",
+            choices=[policy.value for policy in DocstringPolicyEnum],
+            default=DocstringPolicyEnum.all.value,
+            help="Which docstrings to generate: all, missing or short (missing "
+            "or shorter than `--min-docstring-length`)",
+        )
+        parser.add_argument(
+            "--min-docstring-length",
+            type=int,
+            default=30,
+            help="Docstrings shorter than this many characters are short",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate all docstrings without using cached docstrings",
+        )
+        parser.add_argument(
+            "--stream",
+            action="store_true",
+            help="Save each file as soon as its docstrings are generated, and "
+            "release it from memory",
+        )
+        parser.add_argument(
+            "--pipeline",
+            action="store_true",
+            help="Summarize and embed each file for the README as soon as its "
+            "docstrings are generated, while other files are still documented "
+            "(implies `--stream`)",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Reuse the docstrings journaled by an interrupted run instead of "
+            "generating them again",
+        )
+        parser.add_argument(
+            "--changed-since",
+            default=None,
+            metavar="REF",
+            help="Only generate docstrings for files changed since the git ref",
+        )
+        parser.add_argument(
+            "--changed-since-last-run",
+            action="store_true",
+            help="Only generate docstrings for files changed since the last run",
+        )
+        parser.add_argument(
+            "--report",
+            type=Path,
+            default=None,
+            help="Path to the JSON report with timings and token counts of the run "
+            "(default: report.json in the cache directory)",
+        )
         parser.add_argument(
             "--compile",
             action="store_true",
@@ -1,13 +1,20 @@
 from pathlib import Path
+from typing import List, Optional
+import logging
+import re
+import tiktoken
 from langchain.chains import RetrievalQA
-from langchain.chat_models import ChatOpenAI
+from langchain.chains.question_answering import load_qa_chain
 from langchain.prompts import (
     ChatPromptTemplate,
     SystemMessagePromptTemplate,
     HumanMessagePromptTemplate,
 )
+from langchain.schema import Document
 
+from gpt4docs.model.LLMBackend import LLMBackend
 from gpt4docs.modules.datamodels import PyDefinition
+from gpt4docs.modules.scheduling.TokenBudget import CHARACTERS_PER_TOKEN
 
 TOKENS_LIMIT = {
     "gpt-3.5-turbo": 4096,
@@ -17,8 +24,16 @@ TOKENS_LIMIT = {
     "gpt-3.5-turbo-16k": 16384,
 }
 
+# Expected length of a generated docstring, reserved when budgeting requests
+COMPLETION_TOKENS = 300
+
 prompt_dir = Path(__file__).parent / "prompts"
 
+logger = logging.getLogger(__name__)
+
+# Header before each docstring in the response to a batched prompt
+re_batch_header = re.compile(r"^[ \t]*###[ \t]*(\d+)[ \t]*$", flags=re.MULTILINE)
+
 
 class DocstringLLM:
     def __init__(
@@ -26,6 +41,7 @@ class DocstringLLM:
         retriever=None,
         callbacks=None,
         model_name="gpt-3.5-turbo-16k",
+        backend: Optional[LLMBackend] = None,
     ):
         """
         Setup the langchain Chain class for Q&A with LLM
@@ -38,19 +54,39 @@ class DocstringLLM:
 
         if callbacks is None:
             callbacks = []
+        if backend is None:
+            backend = LLMBackend()
 
         self.callbacks = callbacks
-        self.model = ChatOpenAI(model_name=model_name, streaming=False, temperature=0)
+        self.model_name = model_name
+        # Requests are retried by the scheduler, which adapts to rate limits
+        self.model = backend.create(model_name, max_retries=1)
         self.retriever = retriever
+        self._encoding = None
+
+        system_template = open(prompt_dir / "qa.txt").read()
+        human_template = "Write a docstring for the following definition: `{question}`\nGenerated Docstring:"  # noqa: E501
+
+        batch_human_template = (
+            "Write a docstring for each of the following definitions. Start "
+            "each docstring with a line `### <number>` with the number of its "
+            "definition and write nothing else.\n{question}\nGenerated Docstrings:"
+        )
+
+        # Full prompts, used to identify responses generated with them
+        self.prompt_template = system_template + human_template
+        self.batch_prompt_template = system_template + batch_human_template
 
         qa_prompt = ChatPromptTemplate.from_messages(
             [
-                SystemMessagePromptTemplate.from_template(
-                    open(prompt_dir / "qa.txt").read()
-                ),
-                HumanMessagePromptTemplate.from_template(
-                    "Write a docstring for the following definition: `{question}`\nGenerated Docstring:"  # noqa: E501
-                ),
+                SystemMessagePromptTemplate.from_template(system_template),
+                HumanMessagePromptTemplate.from_template(human_template),
+            ]
+        )
+        batch_prompt = ChatPromptTemplate.from_messages(
+            [
+                SystemMessagePromptTemplate.from_template(system_template),
+                HumanMessagePromptTemplate.from_template(batch_human_template),
             ]
         )
 
@@ -63,14 +99,105 @@ class DocstringLLM:
             },
             retriever=self.retriever,
         )
+        self.batch_chain = load_qa_chain(
+            self.model, chain_type="stuff", prompt=batch_prompt
+        )
+
+    @property
+    def tokens_limit(self) -> int:
+        return TOKENS_LIMIT[self.model_name]
 
     def run(self, definition: PyDefinition) -> str:
         response = self.chain.run(definition.source)
         return self._format_response(response)
 
-    async def arun(self, definition: PyDefinition) -> str:
-        response = await self.chain.arun(query=definition.source)
+    async def arun(
+        self, definition: PyDefinition, documents: Optional[List[Document]] = None
+    ) -> str:
+        """Generate a docstring for the definition. If `documents` are given,
+        they are used as context instead of querying the retriever"""
+        if documents is None:
+            response = await self.chain.arun(query=definition.source)
+        else:
+            response = await self.chain.combine_documents_chain.arun(
+                input_documents=documents, question=definition.source
+            )
         return self._format_response(response)
 
+    async def arun_batch(
+        self, definitions: List[PyDefinition], documents: List[Document]
+    ) -> List[str]:
+        """Generate docstrings for several definitions in one request, with
+        `documents` as shared context. Raises a ValueError if the response
+        does not contain exactly one docstring per definition"""
+        response = await self.batch_chain.arun(
+            input_documents=documents, question=self._batch_question(definitions)
+        )
+        return self._parse_batch_response(response, len(definitions))
+
+    def count_tokens(self, definition: PyDefinition, documents: List[Document]) -> int:
+        """Count the tokens of the prompt of a request"""
+        return self._count_tokens(self.prompt_template, definition.source, documents)
+
+    def count_batch_tokens(
+        self, definitions: List[PyDefinition], documents: List[Document]
+    ) -> int:
+        """Count the tokens of the prompt of a batched request"""
+        return self._count_tokens(
+            self.batch_prompt_template, self._batch_question(definitions), documents
+        )
+
+    def completion_tokens(self, count: int = 1) -> int:
+        """Tokens reserved for the completion of `count` docstrings"""
+        return COMPLETION_TOKENS * count
+
+    def count_text_tokens(self, text: str) -> int:
+        """Count the tokens of a text, e.g. a generated docstring"""
+        if self._encoding is None:
+            try:
+                self._encoding = tiktoken.encoding_for_model(self.model_name)
+            except OSError as e:
+                # The encoding is downloaded on first use
+                logger.warning(f"Tokenizer unavailable, estimating tokens: {e}")
+                self._encoding = False
+
+        if self._encoding is False:
+            return len(text) // CHARACTERS_PER_TOKEN
+        return len(self._encoding.encode(text))
+
+    def _count_tokens(
+        self, prompt_template: str, question: str, documents: List[Document]
+    ) -> int:
+        prompt = "\n\n".join(
+            [prompt_template, question]
+            + [document.page_content for document in documents]
+        )
+        return self.count_text_tokens(prompt)
+
+    def _batch_question(self, definitions: List[PyDefinition]) -> str:
+        return "\n".join(
+            f"{index}. `{definition.source}`"
+            for index, definition in enumerate(definitions, start=1)
+        )
+
+    def _parse_batch_response(self, response: str, count: int) -> List[str]:
+        """Split the response into docstrings by their `### <number>` headers"""
+        parts = re_batch_header.split(response)
+
+        docstrings = {}
+        # Parts alternate between numbers and docstrings after the first header
+        for number, docstring in zip(parts[1::2], parts[2::2]):
+            docstring = self._format_response(docstring).strip("\n")
+            if docstring.strip() == "" or int(number) in docstrings:
+                raise ValueError(f"Invalid docstring {number} in batched response")
+            docstrings[int(number)] = docstring
+
+        if sorted(docstrings) != list(range(1, count + 1)):
+            raise ValueError(
+                f"Expected {count} docstrings in batched response, "
+                f"got {sorted(docstrings)}"
+            )
+        return [docstrings[number] for number in range(1, count + 1)]
+
     def _format_response(self, response: str) -> str:
         return response.replace('"""', "")
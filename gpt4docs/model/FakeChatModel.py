@@ -0,0 +1,97 @@
+from typing import Any, List, Optional
+import asyncio
+import hashlib
+import re
+import time
+
+import openai
+from langchain.chat_models.base import BaseChatModel
+from langchain.schema import AIMessage, BaseMessage, ChatGeneration, ChatResult
+
+from gpt4docs.modules.scheduling.TokenBudget import CHARACTERS_PER_TOKEN
+
+re_definition_name = re.compile(r"\b(?:def|class)\s+(\w+)")
+# Numbered definitions of a batched docstring prompt
+re_batch_definition = re.compile(r"^(\d+)\. `(.*)", flags=re.MULTILINE)
+
+
+class FakeChatModel(BaseChatModel):
+    """Local chat model for tests and benchmarks, without network access.
+
+    Responses are taken in turn from `responses`, or else templated from the
+    prompt: docstrings for docstring prompts (also batched) and a short text
+    that differs per prompt otherwise. Each response takes `latency` seconds.
+    Like a rate limited API, async requests beyond `max_in_flight` fail with a
+    RateLimitError."""
+
+    latency: float = 0.0
+    responses: List[str] = []
+    max_in_flight: Optional[int] = None
+    calls: int = 0
+    in_flight: int = 0
+    rate_limited: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def get_num_tokens(self, text: str) -> int:
+        """Estimate from the number of characters, instead of a tokenizer"""
+        return len(text) // CHARACTERS_PER_TOKEN
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.max_in_flight is not None and self.in_flight >= self.max_in_flight:
+            self.rate_limited += 1
+            raise openai.error.RateLimitError(
+                f"More than {self.max_in_flight} requests in flight"
+            )
+
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        return self._result(messages)
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        self.calls += 1
+        if len(self.responses) > 0:
+            response = self.responses[(self.calls - 1) % len(self.responses)]
+        else:
+            response = self._template(messages[-1].content)
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=response))]
+        )
+
+    def _template(self, prompt: str) -> str:
+        if "Write a docstring for each of the following definitions" in prompt:
+            return "\n".join(
+                f"### {number}\n{self._docstring(source)}"
+                for number, source in re_batch_definition.findall(prompt)
+            )
+        if "Write a docstring for the following definition" in prompt:
+            return self._docstring(prompt.rpartition("following definition:")[2])
+        # The digest makes responses differ when prompts do, like real ones
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        return f"Fake response to a prompt of {len(prompt)} characters ({digest})."
+
+    def _docstring(self, source: str) -> str:
+        match = re_definition_name.search(source)
+        name = match.group(1) if match is not None else "definition"
+        return f"Fake docstring for {name}."
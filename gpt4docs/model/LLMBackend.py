@@ -0,0 +1,56 @@
+from enum import Enum
+from typing import List, Optional
+import os
+
+from langchain.chat_models import ChatOpenAI
+from langchain.chat_models.base import BaseChatModel
+
+from gpt4docs.model.FakeChatModel import FakeChatModel
+
+
+class LLMBackendEnum(str, Enum):
+    openai = "openai"  # OpenAI API, or a compatible server at `base_url`
+    fake = "fake"  # Local templated or replayed responses
+
+
+class LLMBackend:
+    """Creates the chat models used by the LLMs"""
+
+    def __init__(
+        self,
+        backend: LLMBackendEnum | str = LLMBackendEnum.openai,
+        base_url: Optional[str] = None,
+        latency: float = 0.0,
+        responses: Optional[List[str]] = None,
+        rate_limit: Optional[int] = None,
+    ) -> None:
+        self.backend = LLMBackendEnum(backend)
+        self.base_url = base_url
+        self.latency = latency
+        self.responses = responses or []
+        self.rate_limit = rate_limit
+
+    def create(self, model_name: str, max_retries: int = 6) -> BaseChatModel:
+        """Create a chat model. OpenAI requests are retried up to
+        `max_retries` times by langchain."""
+        if self.backend == LLMBackendEnum.fake:
+            return FakeChatModel(
+                latency=self.latency,
+                responses=self.responses,
+                max_in_flight=self.rate_limit,
+            )
+
+        kwargs = {}
+        if self.base_url is not None:
+            # Local servers usually do not check the key, but one must be set
+            kwargs = {
+                "openai_api_base": self.base_url,
+                "openai_api_key": os.getenv("OPENAI_API_KEY", "EMPTY"),
+            }
+        return ChatOpenAI(
+            model_name=model_name,
+            streaming=False,
+            temperature=0,
+            max_retries=max_retries,
+            **kwargs,
+        )
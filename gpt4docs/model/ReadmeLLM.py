@@ -1,9 +1,16 @@
 from pathlib import Path
 from langchain import PromptTemplate
-from langchain.chains.summarize import load_summarize_chain
-from langchain.chat_models import ChatOpenAI
+from langchain.chains import LLMChain
+from typing import Dict, List, Optional
+import asyncio
 import logging
 
+from gpt4docs.model.LLMBackend import LLMBackend
+from gpt4docs.modules.cache import SummaryCache
+from gpt4docs.modules.scheduling import Scheduler
+from gpt4docs.modules.scheduling.Scheduler import REQUEST_ERRORS
+from gpt4docs.modules.scheduling.TokenBudget import CHARACTERS_PER_TOKEN
+
 logger = logging.getLogger(__name__)
 
 TOKENS_LIMIT = {
@@ -14,6 +21,10 @@ TOKENS_LIMIT = {
     "gpt-3.5-turbo-16k": 16384,
 }
 
+# Query for code that shows how to use the project, which is summarized in
+# addition to the tree of summaries
+GETTING_STARTED_QUERY = "How do I get started with the project?"
+
 prompt_dir = Path(__file__).parent / "prompts"
 
 
@@ -23,9 +34,13 @@ class ReadmeLLM:
         retriever=None,
         callbacks=None,
         model_name="gpt-3.5-turbo-16k",
+        backend: Optional[LLMBackend] = None,
+        summary_cache: Optional[SummaryCache] = None,
+        scheduler: Optional[Scheduler] = None,
     ):
         """
-        Setup the langchain Chain class for Q&A with LLM
+        Setup the langchain chains that summarize the project hierarchically:
+        files, then packages, then the README of the project
         """
         if model_name not in TOKENS_LIMIT:
             raise ValueError(
@@ -35,42 +50,189 @@ class ReadmeLLM:
 
         if callbacks is None:
             callbacks = []
+        if backend is None:
+            backend = LLMBackend()
+        if scheduler is None:
+            scheduler = Scheduler()
 
         self.callbacks = callbacks
-        self.model = ChatOpenAI(model_name=model_name, streaming=False, temperature=0)
-        self.reduce_llm = ChatOpenAI(model_name="gpt-4", streaming=False, temperature=0)
+        self.model_name = model_name
+        # Requests are retried by the scheduler, which adapts to rate limits
+        self.model = backend.create(model_name, max_retries=1)
+        self.reduce_llm = backend.create("gpt-4", max_retries=1)
         self.retriever = retriever
+        self.summary_cache = summary_cache
+        self.scheduler = scheduler
+        # Summaries of files requested by `prefetch`, by resolved path
+        self.prefetched: Dict[Path, asyncio.Future] = {}
+
+        def chain(llm, prompt_file: str) -> LLMChain:
+            prompt = PromptTemplate.from_template(open(prompt_dir / prompt_file).read())
+            return LLMChain(llm=llm, prompt=prompt, callbacks=callbacks)
+
+        self.file_chain = chain(self.model, "summarize_file.txt")
+        self.package_chain = chain(self.model, "summarize_package.txt")
+        self.map_chain = chain(self.model, "map.txt")
+        self.readme_chain = chain(self.reduce_llm, "readme.txt")
+
+    def run(self, project_root: str | Path, retriever=None) -> str:
+        return asyncio.run(self.arun(project_root, retriever))
+
+    async def arun(self, project_root: str | Path, retriever=None) -> str:
+        """Write the README of the project at `project_root`. Files are
+        summarized in parallel, then each package from the summaries of its
+        children, and the README from the summaries of the top level and of
+        code retrieved for getting started (by `retriever`, if given, or else
+        the retriever of the LLM)"""
+        tree = self._tree(Path(project_root))
+        summaries = await asyncio.gather(
+            *(self._summarize(name, node) for name, node in tree.items()),
+            self._summarize_relevant_docs(retriever or self.retriever),
+        )
+        summaries = [summary for summary in summaries if summary is not None]
+        if len(summaries) == 0:
+            raise ValueError(f"No Python files to summarize in {project_root}")
+
+        return await self._reduce(
+            "",
+            summaries,
+            self.readme_chain,
+            self._max_characters("gpt-4"),
+        )
+
+    def prefetch(self, project_root: str | Path, file_path: str | Path) -> None:
+        """Start summarizing a file of the project at `project_root` before the
+        README is written, e.g. as soon as its docstrings are saved. Must be
+        called from a running event loop"""
+        file_path = Path(file_path)
+        path = "/".join(file_path.relative_to(project_root).parts)
+        self.prefetched[file_path.resolve()] = asyncio.ensure_future(
+            self._summarize_file(path, file_path)
+        )
+
+    def _tree(self, project_root: Path) -> Dict:
+        """Python files of the project as nested dicts by directory, with the
+        paths of the files as leaves"""
+        tree = {}
+        for file_path in sorted(project_root.glob("**/*.py")):
+            node = tree
+            parts = file_path.relative_to(project_root).parts
+            for part in parts[:-1]:
+                node = node.setdefault(part, {})
+            node[parts[-1]] = file_path
+        return tree
+
+    async def _summarize(self, path: str, node: Dict | Path) -> Optional[str]:
+        """Summary of a file or package, labeled with its path. Files and
+        packages whose requests fail are left out, such that the rest of the
+        project is still summarized"""
+        try:
+            if isinstance(node, Path):
+                prefetched = self.prefetched.pop(node.resolve(), None)
+                if prefetched is not None:
+                    return await prefetched
+                return await self._summarize_file(path, node)
+            return await self._summarize_package(path, node)
+        except REQUEST_ERRORS as e:
+            self._failed(path, e)
+            return None
 
-        readme_prompt = PromptTemplate.from_template(
-            open(prompt_dir / "readme.txt").read()
+    async def _summarize_package(self, path: str, node: Dict) -> Optional[str]:
+        children = await asyncio.gather(
+            *(self._summarize(f"{path}/{name}", child) for name, child in node.items())
         )
-        map_prompt = PromptTemplate.from_template(open(prompt_dir / "map.txt").read())
-
-        self.chain = load_summarize_chain(
-            llm=self.model,
-            reduce_llm=self.reduce_llm,
-            chain_type="map_reduce",
-            map_prompt=map_prompt,
-            combine_prompt=readme_prompt,
-            input_key="input_documents",
-            output_key="output_text",
-            return_intermediate_steps=True,
+        children = [summary for summary in children if summary is not None]
+        if len(children) == 0:
+            return None
+
+        summary = await self._reduce(
+            path,
+            children,
+            self.package_chain,
+            self._max_characters(self.model_name),
         )
+        return f"{path}/:\n{summary}"
+
+    async def _summarize_file(self, path: str, file_path: Path) -> Optional[str]:
+        content = file_path.read_text()
+        if content.strip() == "":
+            return None
 
-    def run(self) -> str:
-        docs = self.get_relevant_docs()
-        response = self.chain({"input_documents": docs})
-        logger.debug("\n\n".join(response["intermediate_steps"]))
-        return response["output_text"]
-
-    async def arun(self) -> str:
-        docs = self.get_relevant_docs()
-        response = await self.chain.acall({"input_documents": docs})
-        logger.debug("\n\n".join(response["intermediate_steps"]))
-        return response["output_text"]
-
-    def get_relevant_docs(self):
-        return self.retriever._get_relevant_documents(
-            query="How do I get started with the project?",
-            run_manager=None,
+        # Large files are summarized in parts
+        size = self._max_characters(self.model_name)
+        parts = [content[i : i + size] for i in range(0, len(content), size)]
+        summaries = await asyncio.gather(
+            *(self._run(self.file_chain, path, part) for part in parts)
         )
+        return f"{path}:\n" + "\n".join(summaries)
+
+    async def _summarize_relevant_docs(self, retriever) -> Optional[str]:
+        """Summary of the code retrieved for getting started"""
+        if retriever is None:
+            return None
+
+        docs = await retriever.aget_relevant_documents(GETTING_STARTED_QUERY)
+        if len(docs) == 0:
+            return None
+        try:
+            summaries = await asyncio.gather(
+                *(self._run(self.map_chain, "", doc.page_content) for doc in docs)
+            )
+        except REQUEST_ERRORS as e:
+            self._failed("getting started", e)
+            return None
+        return "Getting started:\n" + "\n".join(summaries)
+
+    async def _reduce(
+        self, path: str, texts: List[str], chain: LLMChain, max_characters: int
+    ) -> str:
+        """Summarize the texts with one request, after summarizing groups of
+        them with the package prompt until they fit in `max_characters`"""
+        groups = self._group(texts, max_characters)
+        while len(groups) > 1:
+            texts = await asyncio.gather(
+                *(self._run(self.package_chain, path, group) for group in groups)
+            )
+            groups = self._group(texts, max_characters)
+        return await self._run(chain, path, groups[0])
+
+    def _group(self, texts: List[str], max_characters: int) -> List[str]:
+        """Join the texts into as few groups of at most `max_characters` as
+        possible, keeping their order. Longer texts are truncated"""
+        groups, group = [], []
+        size = 0
+        for text in texts:
+            text = text[:max_characters]
+            if len(group) > 0 and size + len(text) > max_characters:
+                groups.append("\n\n".join(group))
+                group, size = [], 0
+            group.append(text)
+            size += len(text) + 2
+        groups.append("\n\n".join(group))
+        return groups
+
+    async def _run(self, chain: LLMChain, path: str, text: str) -> str:
+        """Run the chain, or return its summary of the text from the cache"""
+        inputs = {"path": path, "text": text}
+        inputs = {key: inputs[key] for key in chain.prompt.input_variables}
+
+        key = None
+        if self.summary_cache is not None:
+            model_name = getattr(chain.llm, "model_name", type(chain.llm).__name__)
+            key = SummaryCache.key(model_name, chain.prompt.template, path, text)
+            summary = self.summary_cache.get(key)
+            if summary is not None:
+                return summary
+
+        summary = await self.scheduler.call(chain.apredict, **inputs)
+        if key is not None:
+            self.summary_cache.set(key, summary)
+        return summary
+
+    def _failed(self, path: str, error: Exception) -> None:
+        logger.error(f"Failed to summarize {path}, leaving it out of the README")
+        logger.error(f"{type(error).__name__}: {error}")
+
+    def _max_characters(self, model_name: str) -> int:
+        # Half of the context is left for the prompt and the response
+        return TOKENS_LIMIT[model_name] // 2 * CHARACTERS_PER_TOKEN
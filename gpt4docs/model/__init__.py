@@ -1,2 +1,4 @@
 from gpt4docs.model.DocstringLLM import DocstringLLM
 from gpt4docs.model.ReadmeLLM import ReadmeLLM
+from gpt4docs.model.FakeChatModel import FakeChatModel
+from gpt4docs.model.LLMBackend import LLMBackend, LLMBackendEnum
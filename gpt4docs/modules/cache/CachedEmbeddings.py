@@ -0,0 +1,120 @@
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+import asyncio
+import logging
+import threading
+
+from langchain.embeddings.base import Embeddings
+
+from gpt4docs.modules.cache.EmbeddingCache import EmbeddingCache
+
+logger = logging.getLogger(__name__)
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embedding model with an in-memory LRU cache of `lru_size`
+    vectors and an optional persistent `store`. Texts are only embedded by the
+    model if they are in neither."""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        store: Optional[EmbeddingCache] = None,
+        lru_size: int = 10000,
+    ) -> None:
+        self.embeddings = embeddings
+        self.store = store
+        self.lru_size = lru_size
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+        self._lru: OrderedDict[str, List[float]] = OrderedDict()
+        # Retrievers embed queries in executor threads
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed("document", texts, self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(
+            "query", [text], lambda texts: [self.embeddings.embed_query(texts[0])]
+        )[0]
+
+    # Cache lookups and the wrapped model block, so they run in a thread to
+    # keep the event loop free
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.to_thread(self.embed_query, text)
+
+    def _embed(
+        self,
+        kind: str,
+        texts: List[str],
+        embed: Callable[[List[str]], List[List[float]]],
+    ) -> List[List[float]]:
+        keys = [EmbeddingCache.key(self.model, kind, text) for text in texts]
+
+        with self._lock:
+            vectors = self._lookup(keys)
+
+        # Embed each missing text once, also if it occurs multiple times
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+
+        if len(missing) > 0:
+            embedded = dict(zip(missing, embed(list(missing.values()))))
+            with self._lock:
+                self.misses += len(embedded)
+                for key, vector in embedded.items():
+                    self._remember(key, vector)
+                if self.store is not None:
+                    self.store.set_many(
+                        {
+                            key: EmbeddingCache.encode(vector)
+                            for key, vector in embedded.items()
+                        }
+                    )
+            vectors.update(embedded)
+
+        return [vectors[key] for key in keys]
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Find vectors in memory, then in the store"""
+        vectors = {}
+        for key in keys:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                vectors[key] = self._lru[key]
+        self.memory_hits += len(vectors)
+
+        remaining = [key for key in keys if key not in vectors]
+        if self.store is not None and len(remaining) > 0:
+            stored = self.store.get_many(remaining)
+            self.store_hits += len(stored)
+            for key, value in stored.items():
+                vectors[key] = EmbeddingCache.decode(value)
+                self._remember(key, vectors[key])
+        return vectors
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def summary(self) -> str:
+        lookups = self.memory_hits + self.store_hits + self.misses
+        hit_rate = (
+            (self.memory_hits + self.store_hits) / lookups * 100 if lookups else 0
+        )
+        return (
+            f"{self.memory_hits} memory hits, {self.store_hits} stored hits, "
+            f"{self.misses} embedded ({hit_rate:.1f}% hit rate)"
+        )
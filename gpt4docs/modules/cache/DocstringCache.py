@@ -0,0 +1,38 @@
+from typing import List
+import hashlib
+import json
+
+from langchain.schema import Document
+
+from gpt4docs.modules.cache.SQLiteCache import SQLiteCache
+from gpt4docs.modules.datamodels import PyDefinition
+
+
+class DocstringCache(SQLiteCache):
+    """Cache of generated docstrings. Entries are keyed by everything the
+    response of the LLM depends on"""
+
+    table = "docstrings"
+
+    @staticmethod
+    def chunk_id(document: Document) -> str:
+        content = document.metadata.get("doc_id", "") + document.page_content
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def key(
+        cls,
+        definition: PyDefinition,
+        model_name: str,
+        prompt: str,
+        documents: List[Document],
+    ) -> str:
+        content = json.dumps(
+            [
+                definition.source,
+                model_name,
+                prompt,
+                [cls.chunk_id(document) for document in documents],
+            ]
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
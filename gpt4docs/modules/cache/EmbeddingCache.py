@@ -0,0 +1,28 @@
+from array import array
+from typing import List
+import base64
+import hashlib
+
+from gpt4docs.modules.cache.SQLiteCache import SQLiteCache
+
+
+class EmbeddingCache(SQLiteCache):
+    """Persistent cache of embeddings, keyed by the embedding model and text.
+    Vectors are stored as base64 encoded 32-bit floats"""
+
+    table = "embeddings"
+
+    @staticmethod
+    def key(model: str, kind: str, text: str) -> str:
+        key = f"{model}\n{kind}\n{text}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def encode(vector: List[float]) -> str:
+        return base64.b64encode(array("f", vector).tobytes()).decode("ascii")
+
+    @staticmethod
+    def decode(value: str) -> List[float]:
+        vector = array("f")
+        vector.frombytes(base64.b64decode(value))
+        return vector.tolist()
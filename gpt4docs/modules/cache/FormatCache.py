@@ -0,0 +1,28 @@
+import hashlib
+
+import black
+
+from gpt4docs.modules.cache.SQLiteCache import SQLiteCache
+
+
+class FormatCache(SQLiteCache):
+    """Cache of file contents formatted with black. Entries are keyed by the
+    raw content, the black version and the mode, such that unchanged files
+    are not formatted again"""
+
+    table = "formatted"
+
+    @staticmethod
+    def key(content: str, mode: black.Mode) -> str:
+        key = f"{black.__version__}\n{mode!r}\n{content}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def format(self, content: str, mode: black.Mode) -> str:
+        """Format the content with black, or return it from the cache"""
+        key = self.key(content, mode)
+
+        formatted_content = self.get(key)
+        if formatted_content is None:
+            formatted_content = black.format_str(content, mode=mode)
+            self.set(key, formatted_content)
+        return formatted_content
@@ -0,0 +1,173 @@
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+import sqlite3
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of keys in one query, below the SQLite variable limit
+QUERY_BATCH_SIZE = 500
+
+
+class SQLiteCache:
+    """Persistent key-value cache stored in a SQLite database. When the
+    cache grows beyond `max_size` bytes, the least recently used entries are
+    evicted"""
+
+    table = "cache"
+
+    def __init__(self, path: str | Path, max_size: Optional[int] = None) -> None:
+        if isinstance(path, str):
+            path = Path(path)
+
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        self._connection = None
+        self._total_size = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Connect lazily, such that the cache can be sent to other processes"""
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Callers are responsible for not using the connection concurrently
+            self._connection = sqlite3.connect(
+                self.path, timeout=30, check_same_thread=False
+            )
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT, size INTEGER, accessed REAL)"
+            )
+            self._connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_accessed "
+                f"ON {self.table} (accessed)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    def get(self, key: str) -> Optional[str]:
+        row = self.connection.execute(
+            f"SELECT value FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.connection.execute(
+            f"UPDATE {self.table} SET accessed = ? WHERE key = ?", (time.time(), key)
+        )
+        self.connection.commit()
+        return row[0]
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Get the values of all keys that are in the cache"""
+        keys = list(dict.fromkeys(keys))
+        values = {}
+        for batch in self._batches(keys):
+            placeholders = ", ".join("?" * len(batch))
+            rows = self.connection.execute(
+                f"SELECT key, value FROM {self.table} WHERE key IN ({placeholders})",
+                batch,
+            )
+            values.update(rows)
+
+        self.hits += len(values)
+        self.misses += len(keys) - len(values)
+
+        if len(values) > 0:
+            accessed = time.time()
+            self.connection.executemany(
+                f"UPDATE {self.table} SET accessed = ? WHERE key = ?",
+                [(accessed, key) for key in values],
+            )
+            self.connection.commit()
+        return values
+
+    def set(self, key: str, value: str) -> None:
+        self.set_many({key: value})
+
+    def set_many(self, items: Dict[str, str]) -> None:
+        if len(items) == 0:
+            return
+
+        sizes = {key: len(value.encode("utf-8")) for key, value in items.items()}
+        total_size = self.size() + sum(sizes.values())
+
+        for batch in self._batches(list(items)):
+            placeholders = ", ".join("?" * len(batch))
+            previous = self.connection.execute(
+                f"SELECT size FROM {self.table} WHERE key IN ({placeholders})", batch
+            )
+            total_size -= sum(size for size, in previous)
+
+        accessed = time.time()
+        self.connection.executemany(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, size, accessed) "
+            "VALUES (?, ?, ?, ?)",
+            [(key, value, sizes[key], accessed) for key, value in items.items()],
+        )
+        self.connection.commit()
+        self._total_size = total_size
+
+        if self.max_size is not None and self._total_size > self.max_size:
+            self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache fits `max_size`"""
+        evicted = []
+        total_size = self.size()
+
+        rows = self.connection.execute(
+            f"SELECT key, size FROM {self.table} ORDER BY accessed ASC"
+        )
+        for key, size in rows:
+            if total_size <= self.max_size:
+                break
+            evicted.append((key,))
+            total_size -= size
+
+        self.connection.executemany(f"DELETE FROM {self.table} WHERE key = ?", evicted)
+        self.connection.commit()
+        self._total_size = total_size
+        logger.debug(f"Evicted {len(evicted)} entries from {self.path}")
+
+    def _batches(self, keys: List[str]) -> Iterable[List[str]]:
+        for start in range(0, len(keys), QUERY_BATCH_SIZE):
+            yield keys[start : start + QUERY_BATCH_SIZE]
+
+    def size(self) -> int:
+        """Total size of the cached values in bytes"""
+        if self._total_size is None:
+            row = self.connection.execute(
+                f"SELECT COALESCE(SUM(size), 0) FROM {self.table}"
+            ).fetchone()
+            self._total_size = row[0]
+        return self._total_size
+
+    def __len__(self) -> int:
+        row = self.connection.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        return row[0]
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups * 100 if lookups > 0 else 0
+        return (
+            f"{self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate), "
+            f"{len(self)} entries, {self.size() / 1024 ** 2:.2f} MB"
+        )
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        return state
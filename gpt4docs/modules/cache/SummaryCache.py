@@ -0,0 +1,17 @@
+import hashlib
+import json
+
+from gpt4docs.modules.cache.SQLiteCache import SQLiteCache
+
+
+class SummaryCache(SQLiteCache):
+    """Cache of README summaries of files and packages. Entries are keyed by
+    the content that was summarized, which for packages are the summaries of
+    their children, such that only changed subtrees are summarized again"""
+
+    table = "summaries"
+
+    @staticmethod
+    def key(model_name: str, prompt: str, path: str, content: str) -> str:
+        key = json.dumps([model_name, prompt, path, content])
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
@@ -0,0 +1,6 @@
+from gpt4docs.modules.cache.SQLiteCache import SQLiteCache
+from gpt4docs.modules.cache.DocstringCache import DocstringCache
+from gpt4docs.modules.cache.FormatCache import FormatCache
+from gpt4docs.modules.cache.EmbeddingCache import EmbeddingCache
+from gpt4docs.modules.cache.CachedEmbeddings import CachedEmbeddings
+from gpt4docs.modules.cache.SummaryCache import SummaryCache
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import NamedTuple, Optional
 from pydantic import BaseModel
 from enum import Enum
 
@@ -8,11 +8,39 @@ class PyDefinitionTypeEnum(str, Enum):
     class_ = "class"
 
 
+class Span(NamedTuple):
+    """Location in the source code. Lines are 1-indexed, columns are
+    0-indexed and `start`/`end` are character offsets into the content"""
+
+    lineno: int
+    col_offset: int
+    end_lineno: int
+    end_col_offset: int
+    start: int
+    end: int
+
+
 class PyDefinition(BaseModel):
     source: str  # Definition as it was in the source code
     type: PyDefinitionTypeEnum
     name: str
     docstring: Optional[str] = None
+    qualified_name: Optional[str] = None  # E.g. `Class.method`
+    span: Optional[Span] = None  # Location of `source`
+    docstring_span: Optional[Span] = None  # Location of the original docstring
+
+    @property
+    def key(self) -> str:
+        """Unique identifier of the definition within its file"""
+        return self.qualified_name or self.name
+
+    @property
+    def scope(self) -> str:
+        """Qualified name of the class the definition belongs to, or "" for
+        functions at module level. Classes belong to their own scope"""
+        if self.type == PyDefinitionTypeEnum.class_:
+            return self.key
+        return self.key.rpartition(".")[0]
 
     @property
     def full_docstring(self):
@@ -1 +1 @@
-from gpt4docs.modules.datamodels.PyDefinition import PyDefinition
+from gpt4docs.modules.datamodels.PyDefinition import PyDefinition, Span
@@ -1,8 +1,9 @@
-import re
 import black
-from typing import Dict
+from typing import Dict, Iterable, Optional, Tuple
 from pathlib import Path
+from gpt4docs.modules.cache import FormatCache
 from gpt4docs.modules.datamodels import PyDefinition
+from gpt4docs.modules.parsing import DefinitionScanner
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,61 +13,116 @@ class File:
     """This class will scan a Python file and return all the functions
     and classes in it"""
 
-    original_definitions: Dict[str, PyDefinition] = {}
-    definitions: Dict[str, PyDefinition] = {}
-
-    # Regex for finding functions or classes, and docstrings
-    re_definitions = r"""(?P<definition>^.*\b(?P<type>def|class)\b (?P<name>\w*) *\(?.*?\)?[\s\S]*?:$)\n*( *\"{3}(?P<docstring>[\s\S]*?)\"{3}\n*)?"""  # noqa: E501
-
-    # Regex for finding specific function and classes based on type and name
-    re_specific_definition = (
-        r"(?P<definition>^.*\b(?P<type>{type})\b (?P<name>{name}) *\(?.*?\)?[\s\S]*?:$)\n*"  # noqa: E501
-        + r"( *\"\"\"(?P<docstring>[\s\S]*?)\"\"\"\n*)?"
-    )
-
-    def __init__(self, file_path: str | Path) -> None:
-        """Initializes the Scanner with the file path"""
+    def __init__(
+        self,
+        file_path: str | Path,
+        format_cache: Optional[FormatCache] = None,
+        lazy: bool = False,
+    ) -> None:
+        """Initializes the Scanner with the file path. Formatted content is
+        reused from `format_cache` if given. If `lazy`, the file is only read
+        and scanned when its content or definitions are first accessed"""
         if isinstance(file_path, str):
             file_path = Path(file_path)
-        self.content = self._read_file(file_path)
         self.file_path = file_path
-
-        self.original_definitions = self._scan_for_definitions()
-        self.definitions = self.original_definitions
-
-    def _read_file(self, file_path):
+        self.stat = file_path.stat()
+        self.format_cache = format_cache
+
+        self._content: Optional[str] = None
+        self._original_definitions: Optional[Dict[str, PyDefinition]] = None
+        self._definitions: Optional[Dict[str, PyDefinition]] = None
+
+        if not lazy:
+            self.load()
+
+    @property
+    def loaded(self) -> bool:
+        return self._content is not None
+
+    def load(self) -> None:
+        """Read, format and scan the file, unless it is already loaded"""
+        if self.loaded:
+            return
+
+        self._content = self._read_file(self.file_path, self.format_cache)
+        self._original_definitions = self._scan_for_definitions()
+        self._definitions = dict(self._original_definitions)
+
+    def load_from(self, other: "File") -> None:
+        """Take over the content and definitions of a loaded copy of this
+        file, e.g. one loaded in a worker process"""
+        self._content = other._content
+        self._original_definitions = other._original_definitions
+        self._definitions = other._definitions
+
+    def unload(self) -> None:
+        """Release the content and definitions from memory. They are loaded
+        again from disk when used."""
+        self._content = None
+        self._original_definitions = None
+        self._definitions = None
+
+    @property
+    def content(self) -> str:
+        self.load()
+        return self._content
+
+    @property
+    def original_definitions(self) -> Dict[str, PyDefinition]:
+        self.load()
+        return self._original_definitions
+
+    @property
+    def definitions(self) -> Dict[str, PyDefinition]:
+        self.load()
+        return self._definitions
+
+    def _read_file(self, file_path, format_cache: Optional[FormatCache] = None):
         """Read file and format with black8 before returning content"""
 
         with open(file_path, "r") as f:
             content = f.read()
 
-        formatted_content = black.format_str(content, mode=black.FileMode())
+        if format_cache is not None:
+            formatted_content = format_cache.format(content, mode=black.FileMode())
+        else:
+            formatted_content = black.format_str(content, mode=black.FileMode())
 
         return formatted_content
 
-    def _scan_for_definitions(self) -> None:
-        """Scans the file for functions and classes and their definitions"""
-
-        defs = {}
-
-        # Create definitions from all matches
-        for match in re.finditer(self.re_definitions, self.content, flags=re.MULTILINE):
-            defs[match.group("name")] = PyDefinition(
-                source=match.group("definition"),
-                type=match.group("type"),
-                name=match.group("name"),
-                docstring=match.group("docstring"),
-            )
-        return defs
-
-    def _handle_indentation(self, match, definition) -> str:
+    def _scan_for_definitions(self) -> Dict[str, PyDefinition]:
+        """Scans the file for functions and classes and their definitions,
+        keyed by their qualified name (e.g. `Class.method`)"""
+        return DefinitionScanner().scan(self.content)
+
+    def _quote(self, docstring: str, prefix: str = "", quote: str = '"""') -> str:
+        """Full docstring with quotations, like `PyDefinition.full_docstring`.
+        The prefix and quotes of the original docstring are kept, unless the
+        quotes occur in the docstring"""
+        # Docstrings that already come with their quotations are unwrapped
+        if len(docstring) >= 6 and docstring[:3] == docstring[-3:] == '"""':
+            content = docstring[3:-3]
+        else:
+            content = "\n" + docstring + "\n"
+
+        quote = quote * 3 if len(quote) == 1 else quote
+        if quote in content:
+            quote = "'''" if quote == '"""' else '"""'
+        if quote in content:
+            content = content.replace(quote, "\\" + "\\".join(quote))
+        return prefix + quote + content + quote
+
+    def _handle_indentation(
+        self, located: PyDefinition, definition, prefix: str = "", quote: str = '"""'
+    ) -> str:
         # Indentation level is 4 spaces + any spaces before the definition
         indentation_level = 4
-        indentation_level += len(re.search(r"^ *", match.group("definition")).group(0))
+        indentation_level += len(located.source) - len(located.source.lstrip(" "))
 
         # Apply indentation to full docstring (with quotations)
         indented_docstring = []
-        for line in definition.full_docstring.split("\n"):
+        full_docstring = self._quote(definition.docstring, prefix, quote)
+        for line in full_docstring.split("\n"):
             # Line is empty (no indentation)
             if line.strip() == "":
                 # Important to add empty line to avoid unwanted whitespaces
@@ -83,49 +139,134 @@ class File:
 
         return "\n".join(indented_docstring)
 
-    def _write_docstring(self, lines: str, definition: PyDefinition) -> str:
-        """Find the definition in the file and write the docstring from the
-        pydefinition object"""
-        if definition.docstring is None:
-            return lines
+    def _locate(
+        self, located: Dict[str, PyDefinition], definition: PyDefinition
+    ) -> Optional[PyDefinition]:
+        """Find the definition among the definitions located in the content,
+        by qualified name or else by type and name"""
+        if definition.key in located:
+            return located[definition.key]
+
+        for candidate in located.values():
+            if candidate.name == definition.name and candidate.type == definition.type:
+                return candidate
+        return None
+
+    def _docstring_edit(
+        self, lines: str, located: PyDefinition, definition: PyDefinition
+    ) -> Optional[Tuple[int, int, str]]:
+        """Return the replacement (start, end, text) that writes the docstring
+        between the header and the body of the located definition"""
+        header, docstring = located.span, located.docstring_span
+
+        prefix, quote = "", '"""'
+        if docstring is not None:
+            prefix, quote, original = DefinitionScanner.split_quotes(
+                lines[docstring.start : docstring.end]
+            )
+            # Docstrings that did not change are left as written
+            if definition.docstring == original:
+                return None
 
-        # Regex to find specific definition
-        re_specific_def = self.re_specific_definition.format(
-            type=definition.type, name=definition.name
+        indented_docstring = self._handle_indentation(
+            located, definition, prefix, quote
         )
+        # Classes get an empty line after the docstring
+        suffix = "\n\n" if located.type == "class" else "\n"
+
+        if docstring is not None and docstring.lineno > header.end_lineno:
+            # Replace the existing docstring line(s)
+            start = docstring.start - docstring.col_offset
+            end = docstring.end
+            text = indented_docstring + suffix
+        else:
+            header_line_end = lines.find("\n", header.end)
+            if header_line_end == -1:
+                header_line_end = len(lines)
+
+            if docstring is not None:
+                # Docstring on the same line as the header
+                start, end = header.end, docstring.end
+            elif lines[header.end : header_line_end].strip(" \t").startswith("#"):
+                # Keep comments after the header
+                start = end = header_line_end
+            elif lines[header.end : header_line_end].strip() != "":
+                logger.warning(
+                    f"Cannot write docstring of {definition.key} in file "
+                    f"{self.file_path}, since its body is on the same line"
+                )
+                return None
+            else:
+                start = end = header_line_end
+            text = "\n" + indented_docstring + suffix
+
+        # Remove empty lines between the docstring and the body
+        while end < len(lines) and lines[end] == "\n":
+            end += 1
+
+        return start, end, text
+
+    def _write_docstrings(
+        self,
+        lines: str,
+        definitions: Iterable[PyDefinition],
+        located: Dict[str, PyDefinition],
+    ) -> str:
+        """Write the docstrings of all definitions in a single pass. Each
+        definition is found in `located`, the definitions scanned from `lines`,
+        and replacements are applied by their offsets"""
+        edits = []
+        for definition in definitions:
+            if definition.docstring is None:
+                continue
 
-        # Match to find indentation level
-        match = re.search(re_specific_def, lines, flags=re.MULTILINE)
-
-        if match is None:
-            logger.warning(
-                f"Could not find definition {definition.name} in file {self.file_path}"
-            )
-            return lines
+            location = self._locate(located, definition)
+            if location is None:
+                logger.warning(
+                    f"Could not find definition {definition.key} in file "
+                    f"{self.file_path}"
+                )
+                continue
 
-        indented_docstring = self._handle_indentation(match, definition)
-        replacement = rf"\g<definition>\n{indented_docstring}\n"
+            edit = self._docstring_edit(lines, location, definition)
+            if edit is not None:
+                edits.append(edit)
 
-        if match.group("type") == "class":
-            replacement += "\n"
+        # Build the new content once, from the text between the replacements
+        parts = []
+        position = 0
+        for start, end, text in sorted(edits):
+            if start < position:
+                logger.warning(f"Overlapping docstrings in file {self.file_path}")
+                continue
+            parts.append(lines[position:start])
+            parts.append(text)
+            position = end
+        parts.append(lines[position:])
 
-        new_code = re.sub(re_specific_def, replacement, lines, flags=re.MULTILINE)
+        return "".join(parts)
 
-        return new_code
+    def _write_docstring(self, lines: str, definition: PyDefinition) -> str:
+        """Find the definition in the file and write the docstring from the
+        pydefinition object"""
+        return self._write_docstrings(
+            lines, [definition], DefinitionScanner().scan(lines)
+        )
 
     def set_docstring(self, name: str, docstring: str) -> None:
-        """Set the definitions for a given function or class in the file"""
+        """Set the docstring for a given function or class in the file by its
+        qualified name"""
         self.definitions[name].docstring = docstring
 
     def set_definition(self, definition: PyDefinition) -> None:
-        self.definitions[definition.name] = definition
+        self.definitions[definition.key] = definition
 
     def save(self, path: Path = None, overwrite: bool = False) -> None:
         """Writes the new definitions to the file"""
-        lines = self.content
-
-        for definition in self.definitions.values():
-            lines = self._write_docstring(lines, definition)
+        # Original definitions are located in the content by the scanner
+        lines = self._write_docstrings(
+            self.content, self.definitions.values(), self.original_definitions
+        )
 
         if overwrite:
             path = self.file_path
@@ -1,41 +1,173 @@
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Iterable, List, Optional, Set, Tuple
+from gpt4docs.modules.cache import FormatCache
 from gpt4docs.modules.directory import File
+from gpt4docs.modules.metrics import RunMetrics
 import logging
+import os
+import shutil
+import subprocess
+import time
 
 logger = logging.getLogger(__name__)
 
 
+def load_file(file: File) -> Tuple[File, float, bool]:
+    """Load a file and return it with the time it took in seconds, and
+    whether the formatted content was cached. Defined at module level such
+    that it can be run in worker processes."""
+    start = time.perf_counter()
+    format_cache = file.format_cache
+    hits = format_cache.hits if format_cache is not None else 0
+    file.load()
+    cached = format_cache is not None and format_cache.hits > hits
+    return file, time.perf_counter() - start, cached
+
+
 class Project:
-    def __init__(self, project_root: str | Path):
+    def __init__(
+        self,
+        project_root: str | Path,
+        workers: Optional[int] = None,
+        format_cache: Optional[FormatCache] = None,
+        lazy: bool = False,
+        metrics: Optional[RunMetrics] = None,
+    ):
+        """Finds all Python files in the project. Files are formatted and
+        scanned by `workers` processes (defaults to the number of CPUs), and
+        formatted content is reused from `format_cache` if given. If `lazy`,
+        files are only loaded by `load` or when they are first used. Time spent
+        loading and saving each file is recorded in `metrics`."""
         if isinstance(project_root, str):
             project_root = Path(project_root)
 
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError(f"Workers must be at least 1, got {workers}")
+        if metrics is None:
+            metrics = RunMetrics()
+
         self.project_root = project_root
+        self.workers = workers
+        self.format_cache = format_cache
+        self.metrics = metrics
+        # Files saved while docstrings of other files are still generated
+        self.saved_files: Set[str] = set()
         self.files = {
-            self.get_file_path_by_path(file_path): File(file_path)
-            for file_path in self.project_root.glob("**/*.py")
+            self.get_file_path_by_path(file_path): File(
+                file_path, format_cache=format_cache, lazy=True
+            )
+            for file_path in sorted(self.project_root.glob("**/*.py"))
         }
 
+        if not lazy:
+            self.load()
+
+    def load(self, paths: Optional[Iterable[str]] = None) -> None:
+        """Load all files (or the files at `paths`, relative to the project
+        root) that are not loaded yet, in parallel if there are multiple
+        workers"""
+        if paths is None:
+            paths = self.files.keys()
+        pending = [path for path in paths if not self.files[path].loaded]
+        if len(pending) == 0:
+            return
+
+        start = time.perf_counter()
+        workers = min(self.workers, len(pending))
+        files = [self.files[path] for path in pending]
+
+        if workers <= 1:
+            loaded = [load_file(file) for file in files]
+        else:
+            # Send files in chunks to reduce the overhead of each task
+            chunksize = max(1, len(files) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                loaded = list(executor.map(load_file, files, chunksize=chunksize))
+
+            # Workers use copies of the cache, so count their lookups here
+            if self.format_cache is not None:
+                hits = sum(cached for _, _, cached in loaded)
+                self.format_cache.hits += hits
+                self.format_cache.misses += len(loaded) - hits
+
+        # Workers return copies, whose state is moved into the files such that
+        # references to them stay valid
+        for path, (file, elapsed, _) in zip(pending, loaded):
+            logger.debug(f"Loaded {file.file_path} in {elapsed:.3f}s")
+            self.metrics.add_file_time(file.file_path, "load", elapsed)
+            if file is not self.files[path]:
+                self.files[path].load_from(file)
+
+        slowest, elapsed, _ = max(loaded, key=lambda item: item[1])
+        logger.info(
+            f"Loaded {len(loaded)} files in {time.perf_counter() - start:.2f}s "
+            f"with {workers} worker(s), slowest: {slowest.file_path} "
+            f"({elapsed:.2f}s)"
+        )
+
+        if self.format_cache is not None:
+            logger.info(f"Format cache: {self.format_cache.summary()}")
+
     def save(self, suffix: str = "_commented", overwrite: bool = False):
-        """Save the project to a new folder."""
+        """Save the project to a new folder. Files already saved by
+        `save_file` are skipped."""
+        new_root = self.get_new_root(suffix, overwrite)
+
+        pending = [
+            file for path, file in self.files.items() if path not in self.saved_files
+        ]
+        for file in pending:
+            self._save_file(file, new_root, overwrite)
+
+        logger.info(
+            f"Saved {len(pending)} files to {new_root} "
+            f"({len(self.files) - len(pending)} saved before)"
+        )
+        return new_root
+
+    def save_file(
+        self, file: File, suffix: str = "_commented", overwrite: bool = False
+    ) -> Path:
+        """Save a single file to the new folder as soon as its docstrings are
+        done, and release it from memory. Returns the path it was saved to"""
+        path = self._save_file(file, self.get_new_root(suffix, overwrite), overwrite)
+        self.saved_files.add(self.get_file_path(file))
+        file.unload()
+        return path
+
+    def get_new_root(self, suffix: str = "_commented", overwrite: bool = False):
         if overwrite:
-            new_root = self.project_root
-        else:
-            new_root = self.project_root.parent / (self.project_root.name + suffix)
+            return self.project_root
+        return self.project_root.parent / (self.project_root.name + suffix)
 
-        for file in self.files.values():
-            if not overwrite:
-                # Replace name of the project root with the new root name
-                dir_ = new_root / file.file_path.relative_to(self.project_root)
-                dir_.parent.mkdir(parents=True, exist_ok=True)
+    def _save_file(self, file: File, new_root: Path, overwrite: bool) -> Path:
+        start = time.perf_counter()
+        path = file.file_path
+        if not overwrite:
+            # Replace name of the project root with the new root name
+            dir_ = new_root / file.file_path.relative_to(self.project_root)
+            dir_.parent.mkdir(parents=True, exist_ok=True)
+            path = dir_
+            if not file.loaded and dir_.exists():
+                # Unchanged files keep the docstrings of earlier runs
+                logger.debug(f"Keeping {dir_}")
+            elif not file.loaded:
+                # Files that were never loaded are unchanged
+                logger.debug(f"Copying {file.file_path} to {dir_}")
+                shutil.copyfile(file.file_path, dir_)
+            else:
                 logger.debug(f"Saving {file.file_path} to {dir_}")
                 file.save(dir_, overwrite=False)
-            else:
-                logger.debug(f"Overwrites {file.file_path}")
-                file.save(overwrite=True)
-
-        logger.info(f"Saved {len(self.files)} files to {new_root}")
-        return new_root
+        elif not file.loaded:
+            logger.debug(f"Skipping unchanged {file.file_path}")
+        else:
+            logger.debug(f"Overwrites {file.file_path}")
+            file.save(overwrite=True)
+        self.metrics.add_file_time(file.file_path, "save", time.perf_counter() - start)
+        return path
 
     def add_readme(self, content: str, project_dir: str | Path | None = None):
         """Add a README.md file"""
@@ -70,6 +202,28 @@ class Project:
         else:
             return f"{padding}└── {dir_path.name}"
 
+    def changed_since_ref(self, ref: str) -> Set[str]:
+        """Files changed since the git `ref`, including uncommitted changes
+        and untracked files, relative to the project root"""
+        changed = self._git("diff", "--name-only", "--relative", ref, "--")
+        untracked = self._git("ls-files", "--others", "--exclude-standard")
+        return {path for path in changed + untracked if path in self.files}
+
+    def changed_since_time(self, timestamp: float) -> Set[str]:
+        """Files modified after `timestamp`, relative to the project root"""
+        return {
+            path for path, file in self.files.items() if file.stat.st_mtime > timestamp
+        }
+
+    def _git(self, *args: str) -> List[str]:
+        """Run a git command in the project root and return the output lines"""
+        result = subprocess.run(
+            ["git", *args], cwd=self.project_root, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise ValueError(f"git {' '.join(args)} failed: {result.stderr.strip()}")
+        return result.stdout.splitlines()
+
     def get_file_path_by_path(self, file_path: str) -> str:
         """Get the file path relative to the project root."""
         return str(file_path.relative_to(self.project_root))
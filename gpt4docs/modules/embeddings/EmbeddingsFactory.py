@@ -0,0 +1,19 @@
+from enum import Enum
+
+from langchain.embeddings import OpenAIEmbeddings
+from langchain.embeddings.base import Embeddings
+
+from gpt4docs.modules.embeddings.HashingEmbeddings import HashingEmbeddings
+
+
+class EmbeddingsEnum(str, Enum):
+    openai = "openai"  # OpenAI API
+    hashing = "hashing"  # Local bag of identifiers, no network access
+
+
+def get_embeddings(backend: EmbeddingsEnum | str) -> Embeddings:
+    """Create the embedding model of the backend"""
+    backend = EmbeddingsEnum(backend)
+    if backend == EmbeddingsEnum.hashing:
+        return HashingEmbeddings()
+    return OpenAIEmbeddings()
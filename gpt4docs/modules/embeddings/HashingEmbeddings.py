@@ -0,0 +1,64 @@
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, List, Tuple
+import math
+import re
+import zlib
+
+from langchain.embeddings.base import Embeddings
+
+re_identifier = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+# Parts of identifiers, e.g. `get`, `HTTP` and `Response` in `get_HTTPResponse`
+re_subtoken = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+
+@lru_cache(maxsize=2**16)
+def hash_token(token: str, size: int) -> Tuple[int, float]:
+    """Stable index and sign of a token in a vector of `size` dimensions"""
+    value = zlib.crc32(token.encode("utf-8"))
+    return value % size, 1.0 if value & 2**31 else -1.0
+
+
+class HashingEmbeddings(Embeddings):
+    """Local embeddings without network access. Texts are embedded as bags of
+    identifiers and their lowercased parts, hashed into `size` dimensions,
+    with sublinear term frequencies and normalized to unit length."""
+
+    def __init__(self, size: int = 1024) -> None:
+        self.size = size
+        self.model = f"hashing-{size}"
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed_query(text)
+
+    def _tokens(self, text: str) -> List[str]:
+        tokens = []
+        for identifier in re_identifier.findall(text):
+            tokens.append(identifier)
+            for subtoken in re_subtoken.findall(identifier):
+                if subtoken.lower() != identifier:
+                    tokens.append(subtoken.lower())
+        return tokens
+
+    def _embed(self, text: str) -> List[float]:
+        # Identical tokens have the same sign, so counts can be summed per index
+        counts: Dict[int, float] = defaultdict(float)
+        for token in self._tokens(text):
+            index, sign = hash_token(token, self.size)
+            counts[index] += sign
+
+        vector = [0.0] * self.size
+        for index, count in counts.items():
+            vector[index] = math.copysign(math.log1p(abs(count)), count)
+
+        norm = math.sqrt(math.fsum(value * value for value in vector))
+        return [value / norm for value in vector] if norm > 0 else vector
@@ -0,0 +1,5 @@
+from gpt4docs.modules.embeddings.HashingEmbeddings import HashingEmbeddings
+from gpt4docs.modules.embeddings.EmbeddingsFactory import (
+    EmbeddingsEnum,
+    get_embeddings,
+)
@@ -0,0 +1,96 @@
+from pathlib import Path
+from typing import Dict, Tuple
+import hashlib
+import json
+import logging
+
+from gpt4docs.modules.datamodels import PyDefinition
+
+logger = logging.getLogger(__name__)
+
+
+class DocstringJournal:
+    """Append-only journal of generated docstrings, one JSON line per
+    definition, written as soon as each docstring arrives. If `resume`, the
+    entries of an interrupted run are restored instead of generated again,
+    as long as the source of their definitions did not change."""
+
+    def __init__(self, path: str | Path, resume: bool = False) -> None:
+        self.path = Path(path)
+        self.entries: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        if resume:
+            self.entries = self._read()
+            logger.info(f"Resuming with {len(self.entries)} journaled docstrings")
+
+        # The journal is rewritten from the valid entries, which also drops a
+        # line that was cut off when the previous run was interrupted
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "w", encoding="utf-8")
+        for (file_path, key), (source_hash, docstring) in self.entries.items():
+            self._write(file_path, key, source_hash, docstring)
+        self._file.flush()
+
+    @staticmethod
+    def file_key(file_path: str | Path) -> str:
+        return str(Path(file_path).resolve())
+
+    @staticmethod
+    def source_hash(definition: PyDefinition) -> str:
+        return hashlib.sha256(definition.source.encode("utf-8")).hexdigest()
+
+    def restore(self, file_path: str | Path, definition: PyDefinition) -> bool:
+        """Set the journaled docstring of the definition, if there is one"""
+        entry = self.entries.get((self.file_key(file_path), definition.key))
+        if entry is None or entry[0] != self.source_hash(definition):
+            return False
+        definition.docstring = entry[1]
+        return True
+
+    def append(self, file_path: str | Path, definition: PyDefinition) -> None:
+        """Record the docstring of the definition, flushed right away such that
+        it survives the process being killed"""
+        file_path = self.file_key(file_path)
+        source_hash = self.source_hash(definition)
+        self.entries[(file_path, definition.key)] = (source_hash, definition.docstring)
+        self._write(file_path, definition.key, source_hash, definition.docstring)
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def clear(self) -> None:
+        """Remove the journal after a run completed"""
+        self.close()
+        self.path.unlink(missing_ok=True)
+        self.entries = {}
+
+    def _write(self, file_path: str, key: str, source_hash: str, docstring: str):
+        entry = {
+            "file": file_path,
+            "key": key,
+            "source": source_hash,
+            "docstring": docstring,
+        }
+        self._file.write(json.dumps(entry) + "\n")
+
+    def _read(self) -> Dict[Tuple[str, str], Tuple[str, str]]:
+        if not self.path.exists():
+            logger.info(f"No journal found at {self.path}")
+            return {}
+
+        entries = {}
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping incomplete journal entry: {line!r}")
+                    continue
+                entries[(entry["file"], entry["key"])] = (
+                    entry["source"],
+                    entry["docstring"],
+                )
+        return entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -0,0 +1 @@
+from gpt4docs.modules.journal.DocstringJournal import DocstringJournal
@@ -1,42 +1,370 @@
-from gpt4docs.model import DocstringLLM, ReadmeLLM
-import asyncio
+from gpt4docs.model import DocstringLLM, LLMBackend, ReadmeLLM
 import logging
+import time
 
+from gpt4docs.modules.cache import DocstringCache, SummaryCache
+from gpt4docs.modules.datamodels import PyDefinition
 from gpt4docs.modules.directory import File
-from typing import List
+from gpt4docs.modules.journal import DocstringJournal
+from gpt4docs.modules.metrics import RunMetrics
+from gpt4docs.modules.policies import DocstringPolicy
+from gpt4docs.modules.retrieval import ContextRetriever, ContextScopeEnum
+from gpt4docs.modules.scheduling import Scheduler
+from gpt4docs.modules.scheduling.Scheduler import REQUEST_ERRORS
+from gpt4docs.modules.scheduling.TokenBudget import CHARACTERS_PER_TOKEN
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from langchain.schema import Document
 
 logger = logging.getLogger(__name__)
 
 
 class LLMManager:
-    def __init__(self, vectorstore_manager):
+    def __init__(
+        self,
+        vectorstore_manager,
+        docstring_cache: Optional[DocstringCache] = None,
+        scheduler: Optional[Scheduler] = None,
+        policy: Optional[DocstringPolicy] = None,
+        batch_size: int = 1,
+        context_scope: ContextScopeEnum | str = ContextScopeEnum.definition,
+        context_blend: int = 0,
+        llm_backend: Optional[LLMBackend] = None,
+        metrics: Optional[RunMetrics] = None,
+        journal: Optional[DocstringJournal] = None,
+        summary_cache: Optional[SummaryCache] = None,
+    ):
+        if scheduler is None:
+            scheduler = Scheduler()
+        if policy is None:
+            policy = DocstringPolicy()
+        if metrics is None:
+            metrics = RunMetrics()
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1")
+
+        self.docstring_cache = docstring_cache
+        self.scheduler = scheduler
+        self.policy = policy
+        self.batch_size = batch_size
+        self.metrics = metrics
+        self.journal = journal
         self.docstring_llm = DocstringLLM(
             model_name="gpt-3.5-turbo-16k",
             retriever=vectorstore_manager.get_retriever(k=6),
+            backend=llm_backend,
         )
         self.readme_llm = ReadmeLLM(
             model_name="gpt-3.5-turbo-16k",
-            retriever=vectorstore_manager.get_retriever(k=20),
+            retriever=vectorstore_manager.get_retriever(k=6),
+            backend=llm_backend,
+            summary_cache=summary_cache,
+            scheduler=scheduler,
         )
+        # Context of docstrings, optionally with `context_blend` documents
+        # retrieved for each request
+        self.context_retriever = ContextRetriever(
+            self.docstring_llm.retriever,
+            scope=context_scope,
+            blend_retriever=(
+                vectorstore_manager.get_retriever(k=context_blend)
+                if context_blend > 0
+                else None
+            ),
+        )
+
+    async def generate_docstrings(
+        self,
+        files: Iterable[File],
+        on_file_done: Optional[Callable[[File], None]] = None,
+    ) -> Dict[File, List[PyDefinition]]:
+        """Generate docstrings for the definitions of all files. Files are
+        batched lazily as workers become free, and the requests of all files
+        share one queue, such that the number of requests in flight does not
+        depend on the size of the files.
+
+        If `on_file_done` is given, it is called with each file as soon as its
+        docstrings are generated, and the definitions are not returned, such
+        that the file can be released from memory."""
+        counts = {"files": 0, "definitions": 0, "skipped": 0, "requests": 0}
+        all_docstrings: Dict[File, List[PyDefinition]] = {}
+        remaining: Dict[File, int] = {}
 
-    async def generate_docstrings(self, files: List[File]):
-        all_docstrings = {}
+        def finish(file: File):
+            self.context_retriever.release(file)
+            if on_file_done is not None:
+                on_file_done(file)
 
-        for file in files:
-            logger.info(f"Generating docstrings in file: {file.file_path}")
-            tasks = [
-                self._generate_docstring(definition) for definition in file.get_docs()
-            ]
-            definitions = await asyncio.gather(*tasks)
-            logger.debug(definitions)
-            all_docstrings.update({file: definitions})
+        def batches():
+            for file in files:
+                definitions = list(file.get_docs())
+                jobs = [
+                    (file, definition)
+                    for definition in definitions
+                    if self.policy.should_generate(definition)
+                ]
+                counts["skipped"] += len(definitions) - len(jobs)
+                jobs, restored = self._restore(jobs)
+                file_batches = self._batch(jobs)
 
+                counts["files"] += 1
+                counts["definitions"] += len(jobs)
+                counts["requests"] += len(file_batches)
+                if on_file_done is None:
+                    all_docstrings[file] = [definition for _, definition in restored]
+
+                if len(jobs) == 0:
+                    finish(file)
+                    continue
+                remaining[file] = len(jobs)
+                yield from file_batches
+
+        async def generate(batch):
+            file, definitions = batch
+            definitions = await self._generate_batch(file, definitions)
+
+            remaining[file] -= len(definitions)
+            if remaining[file] == 0:
+                del remaining[file]
+                logger.info(f"Generated docstrings in file: {file.file_path}")
+                finish(file)
+            return (file, definitions) if on_file_done is None else None
+
+        logger.info(
+            f"Generating docstrings with concurrency {self.scheduler.concurrency} "
+            f"(policy: {self.policy.mode.value})"
+        )
+        retries = self.scheduler.retries
+        results = await self.scheduler.map(generate, batches())
+
+        # Reassemble the definitions per file
+        for result in results:
+            if result is not None:
+                file, definitions = result
+                all_docstrings[file].extend(definitions)
+        logger.debug(all_docstrings)
+
+        restored = self.metrics.counters.get("restored_docstrings", 0)
+        logger.info(
+            f"Generated docstrings for {counts['definitions']} definitions in "
+            f"{counts['files']} files with {counts['requests']} requests, skipping "
+            f"{counts['skipped']} definitions (policy: {self.policy.mode.value}) "
+            f"and restoring {restored} from the journal"
+        )
+
+        self.metrics.increment("retries", self.scheduler.retries - retries)
+        failed = self.metrics.counters.get("failed_docstrings", 0)
+        if failed > 0:
+            logger.warning(f"Failed to generate {failed} docstrings, kept them as is")
+
+        logger.info(f"Context: {self.context_retriever.summary()}")
         logger.info("Finished generating docstrings")
         return all_docstrings
 
-    async def _generate_docstring(self, definition):
-        definition.docstring = await self.docstring_llm.arun(definition)
+    def _restore(
+        self, jobs: List[Tuple[File, PyDefinition]]
+    ) -> Tuple[List[Tuple[File, PyDefinition]], List[Tuple[File, PyDefinition]]]:
+        """Split the jobs into pending jobs and jobs restored from the journal
+        of an interrupted run"""
+        if self.journal is None or len(self.journal) == 0:
+            return jobs, []
+
+        pending, restored = [], []
+        for file, definition in jobs:
+            if self.journal.restore(file.file_path, definition):
+                restored.append((file, definition))
+            else:
+                pending.append((file, definition))
+        self.metrics.increment("restored_docstrings", len(restored))
+        return pending, restored
+
+    def _batch(
+        self, jobs: List[Tuple[File, PyDefinition]]
+    ) -> List[Tuple[File, List[PyDefinition]]]:
+        """Group definitions of the same file and class into batches of at most
+        `batch_size` definitions. Their sources must fit in half of the token
+        limit, leaving room for the prompt and retrieved documents"""
+        groups: Dict[Tuple[File, str], List[PyDefinition]] = {}
+        for file, definition in jobs:
+            groups.setdefault((file, definition.scope), []).append(definition)
+
+        max_characters = self.docstring_llm.tokens_limit // 2 * CHARACTERS_PER_TOKEN
+
+        batches = []
+        for (file, _), definitions in groups.items():
+            batch, characters = [], 0
+            for definition in definitions:
+                if len(batch) > 0 and (
+                    len(batch) == self.batch_size
+                    or characters + len(definition.source) > max_characters
+                ):
+                    batches.append((file, batch))
+                    batch, characters = [], 0
+                batch.append(definition)
+                characters += len(definition.source)
+            batches.append((file, batch))
+        return batches
+
+    async def _generate_batch(
+        self, file: File, definitions: List[PyDefinition]
+    ) -> List[PyDefinition]:
+        """Generate docstrings for the definitions in one request with shared
+        documents. Batches over the token limit are split, and if the response
+        cannot be parsed, the docstrings are generated one by one"""
+        if len(definitions) == 1:
+            return [await self._generate_docstring(file, definitions[0])]
+
+        llm = self.docstring_llm
+        documents = await self._get_documents(file, definitions)
+
+        pending = []
+        for definition in definitions:
+            docstring = self._get_cached(
+                definition, llm.batch_prompt_template, documents
+            )
+            if docstring is not None:
+                definition.docstring = docstring
+                self._record(file, definition)
+                self.metrics.add_definition(self._key(file, definition), 0, 0, True)
+            else:
+                pending.append(definition)
+
+        if len(pending) == 0:
+            return definitions
+
+        prompt_tokens = llm.count_batch_tokens(pending, documents)
+        tokens = prompt_tokens + llm.completion_tokens(len(pending))
+        if len(pending) > 1 and tokens > llm.tokens_limit:
+            middle = len(pending) // 2
+            await self._generate_batch(file, pending[:middle])
+            await self._generate_batch(file, pending[middle:])
+            return definitions
+
+        await self.scheduler.acquire_tokens(tokens)
+        start = time.perf_counter()
+        try:
+            docstrings = await self.scheduler.call(llm.arun_batch, pending, documents)
+        except ValueError as e:
+            logger.warning(f"Falling back to single requests: {e}")
+            self.metrics.increment("batch_fallbacks")
+            for definition in pending:
+                await self._generate_docstring(file, definition)
+            return definitions
+        except REQUEST_ERRORS as e:
+            self._failed(file, pending, e)
+            return definitions
+        finally:
+            self._add_request_time(file, time.perf_counter() - start)
+
+        for definition, docstring in zip(pending, docstrings):
+            self._set_cached(
+                definition, llm.batch_prompt_template, documents, docstring
+            )
+            definition.docstring = docstring
+            self._record(file, definition)
+            # The shared prompt is attributed evenly to the definitions
+            self.metrics.add_definition(
+                self._key(file, definition),
+                prompt_tokens // len(pending),
+                llm.count_text_tokens(docstring),
+            )
+        return definitions
+
+    async def _generate_docstring(self, file: File, definition: PyDefinition):
+        llm = self.docstring_llm
+        documents = await self._get_documents(file, [definition])
+
+        docstring = self._get_cached(definition, llm.prompt_template, documents)
+        if docstring is not None:
+            definition.docstring = docstring
+            self._record(file, definition)
+            self.metrics.add_definition(self._key(file, definition), 0, 0, True)
+            return definition
+
+        prompt_tokens = llm.count_tokens(definition, documents)
+        await self.scheduler.acquire_tokens(prompt_tokens + llm.completion_tokens())
+        start = time.perf_counter()
+        try:
+            docstring = await self.scheduler.call(
+                llm.arun, definition, documents=documents
+            )
+        except REQUEST_ERRORS as e:
+            self._failed(file, [definition], e)
+            return definition
+        finally:
+            self._add_request_time(file, time.perf_counter() - start)
+
+        self._set_cached(definition, llm.prompt_template, documents, docstring)
+        definition.docstring = docstring
+        self._record(file, definition)
+        self.metrics.add_definition(
+            self._key(file, definition), prompt_tokens, llm.count_text_tokens(docstring)
+        )
         return definition
 
-    async def generate_readme(self):
-        return await self.readme_llm.arun()
+    async def _get_documents(
+        self, file: File, definitions: List[PyDefinition]
+    ) -> List[Document]:
+        start = time.perf_counter()
+        documents = await self.context_retriever.aget_documents(file, definitions)
+        self.metrics.add_latency("retrieval", time.perf_counter() - start)
+        return documents
+
+    def _record(self, file: File, definition: PyDefinition) -> None:
+        if self.journal is not None:
+            self.journal.append(file.file_path, definition)
+
+    def _failed(
+        self, file: File, definitions: List[PyDefinition], error: Exception
+    ) -> None:
+        """Keep the docstrings of the definitions, such that the rest of the
+        file is still documented"""
+        names = ", ".join(definition.key for definition in definitions)
+        logger.error(f"Failed to generate docstrings of {names} in {file.file_path}")
+        logger.error(f"{type(error).__name__}: {error}")
+        self.metrics.increment("failed_docstrings", len(definitions))
+
+    def _add_request_time(self, file: File, seconds: float) -> None:
+        self.metrics.add_latency("llm", seconds)
+        self.metrics.add_file_time(file.file_path, "llm", seconds)
+
+    def _key(self, file: File, definition: PyDefinition) -> str:
+        return f"{file.file_path}:{definition.key}"
+
+    def _get_cached(
+        self, definition: PyDefinition, prompt: str, documents: List[Document]
+    ) -> Optional[str]:
+        if self.docstring_cache is None or self.policy.force:
+            return None
+        return self.docstring_cache.get(
+            self.docstring_cache.key(
+                definition, self.docstring_llm.model_name, prompt, documents
+            )
+        )
+
+    def _set_cached(
+        self,
+        definition: PyDefinition,
+        prompt: str,
+        documents: List[Document],
+        docstring: str,
+    ) -> None:
+        if self.docstring_cache is None:
+            return
+        self.docstring_cache.set(
+            self.docstring_cache.key(
+                definition, self.docstring_llm.model_name, prompt, documents
+            ),
+            docstring,
+        )
+
+    async def generate_readme(self, project_dir: str | Path, vectorstore_manager=None):
+        """README of the project in `project_dir`, with code for getting started
+        retrieved from `vectorstore_manager` if given"""
+        retriever = (
+            vectorstore_manager.get_retriever(k=6)
+            if vectorstore_manager is not None
+            else None
+        )
+        return await self.readme_llm.arun(project_dir, retriever=retriever)
@@ -1,11 +1,39 @@
+from gpt4docs.modules.cache import FormatCache
 from gpt4docs.modules.directory import File, Project
-from typing import Dict
+from gpt4docs.modules.metrics import RunMetrics
+from typing import Dict, Iterable, Optional
 from pathlib import Path
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class ProjectManager:
-    def __init__(self, project_path: str):
-        self.project = Project(Path(project_path))
+    def __init__(
+        self,
+        project_path: str,
+        workers: Optional[int] = None,
+        format_cache: Optional[FormatCache] = None,
+        lazy: bool = False,
+        metrics: Optional[RunMetrics] = None,
+    ):
+        self.project = Project(
+            Path(project_path),
+            workers=workers,
+            format_cache=format_cache,
+            lazy=lazy,
+            metrics=metrics,
+        )
+        self.selected = None
+
+    def select(self, paths: Iterable[str], load: bool = True):
+        """Only generate docstrings for the files at `paths` (relative to the
+        project root). Other files are copied unchanged when saving. If not
+        `load`, files are loaded when they are first used."""
+        self.selected = set(paths)
+        if load:
+            self.project.load(sorted(self.selected))
+        logger.info(f"Selected {len(self.selected)} of {len(self.project.files)} files")
 
     def update_docstrings(self, all_docstrings: Dict[File, Dict]):
         for file, definitions in all_docstrings.items():
@@ -18,5 +46,16 @@ class ProjectManager:
     def save(self):
         return self.project.save()
 
+    def save_file(self, file: File) -> Path:
+        """Save a file whose docstrings are done and release it from memory"""
+        return self.project.save_file(self.project.get_file(file))
+
+    def get_new_root(self) -> Path:
+        return self.project.get_new_root()
+
     def get_files(self):
-        return self.project.files.values()
+        if self.selected is None:
+            return self.project.files.values()
+        return [
+            file for path, file in self.project.files.items() if path in self.selected
+        ]
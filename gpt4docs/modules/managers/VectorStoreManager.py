@@ -1,19 +1,68 @@
 from pathlib import Path
+from typing import Iterable, Optional
 
-from gpt4docs.scripts.build_vectorstore import build_vectorstore
+from gpt4docs.scripts.build_vectorstore import (
+    ChunkerEnum,
+    add_documents,
+    build_vectorstore,
+)
 from langchain.vectorstores import Chroma
 from langchain.embeddings import OpenAIEmbeddings
+from langchain.embeddings.base import Embeddings
 
 
 class VectorStoreManager:
-    def __init__(self, vectorstore_path: str):
+    def __init__(self, vectorstore_path: str, embeddings: Optional[Embeddings] = None):
         self.dir = vectorstore_path
+        self.embeddings = embeddings or OpenAIEmbeddings()
         self.vectorstore = self.load(self.dir)
 
     @staticmethod
-    def build(vectorstore_path: str, documents_folder: str):
+    def build(
+        vectorstore_path: str,
+        documents_folder: str,
+        incremental=False,
+        embeddings: Optional[Embeddings] = None,
+        batch_size: int = 64,
+        concurrency: int = 4,
+        source_path: Optional[str] = None,
+        chunker: ChunkerEnum | str = ChunkerEnum.definition,
+    ):
+        """Build the vectorstore of the documents. Vectors of unchanged chunks
+        are copied from the vectorstore at `source_path`, if given"""
         build_vectorstore(
-            persist_directory=vectorstore_path, documents_folder=documents_folder
+            persist_directory=vectorstore_path,
+            documents_folder=documents_folder,
+            incremental=incremental,
+            embeddings=embeddings,
+            batch_size=batch_size,
+            concurrency=concurrency,
+            source_directory=source_path,
+            chunker=chunker,
+        )
+
+    @staticmethod
+    def add(
+        vectorstore_path: str,
+        documents_folder: str,
+        files: Iterable[str | Path],
+        embeddings: Optional[Embeddings] = None,
+        batch_size: int = 64,
+        concurrency: int = 4,
+        source_path: Optional[str] = None,
+        chunker: ChunkerEnum | str = ChunkerEnum.definition,
+    ):
+        """Embed some files of the folder, which a later incremental build
+        skips"""
+        add_documents(
+            persist_directory=vectorstore_path,
+            documents_folder=documents_folder,
+            files=files,
+            embeddings=embeddings,
+            batch_size=batch_size,
+            concurrency=concurrency,
+            source_directory=source_path,
+            chunker=chunker,
         )
 
     @staticmethod
@@ -27,7 +76,7 @@ class VectorStoreManager:
         return Chroma(
             collection_name="documents",
             persist_directory=str(vectorstore_path),
-            embedding_function=OpenAIEmbeddings(),
+            embedding_function=self.embeddings,
         )
 
     def get_retriever(self, k=6, search_kwargs=None):
@@ -0,0 +1,113 @@
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 90, 99)
+
+
+class RunMetrics:
+    """Collects timings and token counts of a run: wall clock time of each
+    stage, time spent per file, latencies of LLM requests and retrieval, token
+    counts per definition and counters such as cache hits. `report` returns
+    all of them as a JSON serializable dict."""
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, float] = {}
+        self.files: Dict[str, Dict[str, float]] = {}
+        self.latencies: Dict[str, List[float]] = {}
+        self.definitions: Dict[str, Dict[str, Any]] = {}
+        self.counters: Dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the wall clock duration of a stage. Repeated stages add up"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+            logger.info(f"Stage {name} took {elapsed:.2f}s")
+
+    def add_file_time(self, path: str | Path, stage: str, seconds: float) -> None:
+        """Add time spent on a file in a stage, e.g. load, save or llm"""
+        times = self.files.setdefault(str(path), {})
+        times[stage] = times.get(stage, 0.0) + seconds
+
+    def add_latency(self, kind: str, seconds: float) -> None:
+        """Record the latency of one request, e.g. to the LLM or retriever"""
+        self.latencies.setdefault(kind, []).append(seconds)
+
+    def add_definition(
+        self,
+        key: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached: bool = False,
+    ) -> None:
+        """Record the tokens spent on the docstring of a definition. Cached
+        docstrings do not spend any tokens"""
+        self.definitions[key] = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cached": cached,
+        }
+        self.increment("cached_docstrings" if cached else "generated_docstrings")
+
+    def increment(self, name: str, count: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + count
+
+    @staticmethod
+    def percentiles(values: List[float]) -> Dict[str, float]:
+        """Nearest rank percentiles, mean and maximum of the values"""
+        if len(values) == 0:
+            return {}
+        ordered = sorted(values)
+        summary = {
+            f"p{p}": ordered[max(0, -(-p * len(ordered) // 100) - 1)]
+            for p in PERCENTILES
+        }
+        summary["mean"] = sum(ordered) / len(ordered)
+        summary["max"] = ordered[-1]
+        return summary
+
+    def report(self, **extra: Any) -> Dict[str, Any]:
+        """All metrics, with `extra` entries such as the configuration"""
+        tokens = {"prompt": 0, "completion": 0}
+        for definition in self.definitions.values():
+            tokens["prompt"] += definition["prompt_tokens"]
+            tokens["completion"] += definition["completion_tokens"]
+
+        return {
+            **extra,
+            "stages": self.stages,
+            "latencies": {
+                kind: {"count": len(values), **self.percentiles(values)}
+                for kind, values in self.latencies.items()
+            },
+            "tokens": tokens,
+            "counters": self.counters,
+            "files": self.files,
+            "definitions": self.definitions,
+        }
+
+    def save(self, path: str | Path, **extra: Any) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.report(**extra), indent=2, default=str))
+        logger.info(f"Saved run report to {path}")
+
+    def summary(self) -> str:
+        stages = ", ".join(f"{name} {time:.2f}s" for name, time in self.stages.items())
+        llm = self.percentiles(self.latencies.get("llm", []))
+        latency = (
+            f"LLM latency p50 {llm['p50']:.2f}s, p99 {llm['p99']:.2f}s"
+            if llm
+            else "no LLM requests"
+        )
+        return f"{stages}; {latency}"
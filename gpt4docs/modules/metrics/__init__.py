@@ -0,0 +1 @@
+from gpt4docs.modules.metrics.RunMetrics import RunMetrics
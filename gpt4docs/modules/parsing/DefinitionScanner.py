@@ -0,0 +1,276 @@
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import re
+import logging
+
+from gpt4docs.modules.datamodels import PyDefinition, Span
+from gpt4docs.modules.datamodels.PyDefinition import PyDefinitionTypeEnum
+
+logger = logging.getLogger(__name__)
+
+# String literals. Backslashes escape any character, also in raw strings, as
+# far as finding the end of the literal is concerned. Runs of other characters
+# are matched at once, and quotes only if they do not end the literal
+STRING = (
+    r"\"(?:\"\"[^\"\\]*(?:(?:\\.|\"(?!\"\"))[^\"\\]*)*\"\"\""
+    r"|[^\"\\\n]*(?:\\.[^\"\\\n]*)*\")"
+    r"|'(?:''[^'\\]*(?:(?:\\.|'(?!''))[^'\\]*)*'''"
+    r"|[^'\\\n]*(?:\\.[^'\\\n]*)*')"
+)
+STRING_PREFIX = r"[rRbBuUfF]{0,2}"
+COMMENT = r"\#[^\n]*"
+
+# Brackets nested up to two levels. Deeper nesting is handled by
+# `DefinitionScanner._find_header_end`. Runs of plain characters are matched
+# at once, between the tokens that cannot start with one
+PLAIN = r"[^()\[\]{}'\"\#]*"
+BRACKETS_INNER = rf"[(\[{{]{PLAIN}(?:(?:{STRING}|{COMMENT}){PLAIN})*[)\]}}]"
+BRACKETS = rf"[(\[{{]{PLAIN}(?:(?:{STRING}|{COMMENT}|{BRACKETS_INNER}){PLAIN})*[)\]}}]"
+
+# Rest of a definition header after the name, up to and including the colon
+HEADER_PLAIN = r"[^()\[\]{}'\"\#:\n\\]*"
+HEADER = rf"{HEADER_PLAIN}(?:(?:{BRACKETS}|\\\n){HEADER_PLAIN})*:"
+
+# Docstring directly after a definition header, possibly after blank lines
+# and comments
+DOCSTRING = (
+    rf"[ \t]*(?:(?:{COMMENT})?\n(?:[ \t]*(?:{COMMENT})?\n)*[ \t]*)?"
+    rf"(?P<docstring>{STRING_PREFIX}(?:{STRING}))[ \t]*(?:{COMMENT})?(?=\n|\Z)"
+)
+
+DEFINITION_START = r"[ \t]*(?:async[ \t]+)?(?:def|class)[ \t]+\w"
+DEFINITION = (
+    r"\n(?P<indent>[ \t]*)(?:async[ \t]+)?(?P<type>def|class)[ \t]+(?P<name>\w+)"
+    rf"(?:(?P<header>{HEADER})(?:{DOCSTRING})?)?"
+)
+
+# Code skipped between definitions. Strings and comments are skipped as a
+# whole, such that definitions inside of them are ignored
+CODE = r"[^\"'\#\n\\]+"
+SKIP = rf"{STRING}|{COMMENT}|\\.|[^\n]"
+
+
+def statement_line(max_indent: int) -> str:
+    """Regex for the indentation of a line that starts a statement indented by
+    at most `max_indent`"""
+    return rf"[ \t]{{0,{max_indent}}}(?=[^ \t\n#\\])"
+
+
+@lru_cache(maxsize=None)
+def definitions_pattern(max_indent: Optional[int]) -> re.Pattern:
+    """Regex that skips code up to the next definition, and matches the
+    definition with its header and docstring. If `max_indent` is given, it
+    also stops at statements indented by at most `max_indent`, which end the
+    enclosing definitions at that indentation. The skipped code can only end
+    right before such a line or at the end, so there is no backtracking."""
+    if max_indent is None:
+        stop, statement = DEFINITION_START, "(?P<statement>(?!))"
+    else:
+        line = statement_line(max_indent)
+        stop, statement = rf"{DEFINITION_START}|{line}", rf"\n(?P<statement>{line})"
+    return re.compile(
+        rf"(?:{CODE}|\n(?!{stop})|{SKIP})*(?:{DEFINITION}|{statement}|\Z)",
+        flags=re.DOTALL,
+    )
+
+
+@lru_cache(maxsize=None)
+def statement_pattern(max_indent: int) -> re.Pattern:
+    """Regex that skips code up to the next statement indented by at most
+    `max_indent`"""
+    line = statement_line(max_indent)
+    return re.compile(
+        rf"(?:{CODE}|\n(?!{line})|{SKIP})*(?:\n(?P<statement>{line})|\Z)",
+        flags=re.DOTALL,
+    )
+
+
+re_header_tokens = re.compile(
+    rf"{STRING}|{COMMENT}|(?P<bracket>[(\[{{])|(?P<close>[)\]}}])|(?P<colon>:)",
+    flags=re.DOTALL,
+)
+re_docstring = re.compile(DOCSTRING, flags=re.DOTALL)
+
+re_strings_and_comments = re.compile(rf"{STRING}|{COMMENT}", flags=re.DOTALL)
+
+
+class DefinitionScanner:
+    """Finds all functions and classes in Python source code, with their
+    qualified names (e.g. `Class.method`), locations and existing docstrings.
+
+    The source is tokenized in a single linear pass by one regex match per
+    definition, or per statement that is dedented from the definition before
+    it. Nesting is derived from indentation, which also allows scanning
+    indented snippets of code."""
+
+    def scan(self, content: str) -> Dict[str, PyDefinition]:
+        """Scan the content and return the definitions by qualified name"""
+        definitions = {}
+        # Enclosing definitions as (indentation, qualified name)
+        scope: List[Tuple[int, str]] = []
+
+        # Line numbers are counted incrementally, as definitions are in order
+        lineno, position = 1, 0
+
+        def span(start: int, end: int) -> Span:
+            nonlocal lineno, position
+            lineno += content.count("\n", position, start)
+            position = start
+
+            end_lineno = lineno + content.count("\n", start, end)
+            return Span(
+                lineno,
+                start - content.rfind("\n", 0, start) - 1,
+                end_lineno,
+                end - content.rfind("\n", 0, end) - 1,
+                start,
+                end,
+            )
+
+        # Definitions are matched with their preceding newline, which is why
+        # offsets in the match are one more than in `content`
+        shifted = "\n" + content
+        index = 0
+        # Brackets open in the code after the previous definition or statement
+        depth, depth_end = 0, 0
+        while index < len(shifted):
+            pattern = definitions_pattern(scope[-1][0] if len(scope) > 0 else None)
+            match = pattern.match(shifted, index)
+            index = match.end()
+
+            # Statements end the definitions they are dedented from, e.g. an
+            # `if` at module level ends the function before it. Lines inside
+            # of brackets continue the statement before them
+            if match.group("statement") is not None:
+                line_start = match.start("statement") - 1
+                depth += self._depth(content, depth_end, line_start)
+                depth_end = line_start
+                if depth <= 0:
+                    depth = 0
+                    dedent = len(match.group("statement"))
+                    while len(scope) > 0 and scope[-1][0] >= dedent:
+                        scope.pop()
+                continue
+            if match.group("type") is None:
+                continue
+
+            name = match.group("name")
+            start = match.start("indent") - 1
+
+            if match.group("header") is not None:
+                header_end = match.end("header") - 1
+                docstring_match, offset = match, 1
+            else:
+                header_end = self._find_header_end(content, match.end("name") - 1)
+                if header_end is None:
+                    logger.warning(f"Could not find end of definition {name}")
+                    continue
+                docstring_match, offset = re_docstring.match(content, header_end), 0
+
+            indent = len(match.group("indent"))
+            while len(scope) > 0 and scope[-1][0] >= indent:
+                scope.pop()
+
+            qualified_name = f"{scope[-1][1]}.{name}" if len(scope) > 0 else name
+            scope.append((indent, qualified_name))
+
+            # Definitions redefined under the same name (e.g. property setters)
+            # are numbered to keep them apart
+            key = qualified_name
+            count = 1
+            while key in definitions:
+                count += 1
+                key = f"{qualified_name}#{count}"
+
+            header_span = span(start, header_end)
+
+            docstring, docstring_span = None, None
+            if docstring_match is not None and docstring_match.group("docstring"):
+                docstring_span = span(
+                    docstring_match.start("docstring") - offset,
+                    docstring_match.end("docstring") - offset,
+                )
+                docstring = self._strip_quotes(docstring_match.group("docstring"))
+
+            # Scanning continues after the header and docstring
+            code_end = header_end if docstring_span is None else docstring_span.end
+            index = max(index, code_end + 1)
+            depth, depth_end = 0, code_end
+
+            # Values are valid by construction, so validation is skipped
+            definitions[key] = PyDefinition.construct(
+                source=content[start:header_end],
+                type=(
+                    PyDefinitionTypeEnum.class_
+                    if match.group("type") == "class"
+                    else PyDefinitionTypeEnum.function
+                ),
+                name=name,
+                docstring=docstring,
+                qualified_name=key,
+                span=header_span,
+                docstring_span=docstring_span,
+            )
+
+        return definitions
+
+    def dedent_start(
+        self, content: str, start: int, end: int, indent: int
+    ) -> Optional[int]:
+        """Start of the first line between `start` and `end` with a statement
+        indented by at most `indent`, which ends a definition at `indent`.
+        `start` must be outside of strings and brackets, e.g. a header end"""
+        statement = self._find_statement(content, start, end, indent)
+        return statement[0] if statement is not None else None
+
+    def _find_statement(
+        self, content: str, start: int, end: int, max_indent: int
+    ) -> Optional[Tuple[int, int]]:
+        """Start and indentation of the first statement between `start` and
+        `end` that is indented by at most `max_indent`"""
+        pattern = statement_pattern(max_indent)
+        index, depth, depth_end = start, 0, start
+        while index < end:
+            match = pattern.match(content, index, end)
+            if match.group("statement") is None:
+                return None
+
+            # Lines inside of brackets continue the statement before them
+            line_start = match.start("statement")
+            depth += self._depth(content, depth_end, line_start)
+            depth_end = line_start
+            if depth <= 0:
+                return line_start, len(match.group("statement"))
+            index = match.end()
+        return None
+
+    def _depth(self, content: str, start: int, end: int) -> int:
+        """Depth of the brackets open at `end`, counted from `start`"""
+        code = re_strings_and_comments.sub("", content[start:end])
+        opened = code.count("(") + code.count("[") + code.count("{")
+        return opened - code.count(")") - code.count("]") - code.count("}")
+
+    def _find_header_end(self, content: str, pos: int) -> Optional[int]:
+        """Find the end of the colon that ends the header starting at `pos`"""
+        depth = 0
+        for match in re_header_tokens.finditer(content, pos):
+            token = match.lastgroup
+            if token == "bracket":
+                depth += 1
+            elif token == "close":
+                depth -= 1
+            elif token == "colon" and depth == 0:
+                return match.end()
+        return None
+
+    def _strip_quotes(self, literal: str) -> str:
+        """Return the docstring as written, without prefix and quotes"""
+        return self.split_quotes(literal)[2]
+
+    @staticmethod
+    def split_quotes(literal: str) -> Tuple[str, str, str]:
+        """Split a string literal into its prefix, quotes and content"""
+        content = literal.lstrip("rRbBuUfF")
+        prefix = literal[: len(literal) - len(content)]
+        quote = content[:3] if content[:3] in ('"""', "'''") else content[0]
+        return prefix, quote, content[len(quote) : -len(quote)]
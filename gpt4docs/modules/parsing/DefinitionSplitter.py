@@ -0,0 +1,154 @@
+from pathlib import PurePath
+from typing import List, Optional, Tuple
+import copy
+import logging
+
+from langchain.schema import Document
+from langchain.text_splitter import (
+    Language,
+    RecursiveCharacterTextSplitter,
+    TextSplitter,
+)
+
+from gpt4docs.modules.datamodels import PyDefinition
+from gpt4docs.modules.parsing.DefinitionScanner import DefinitionScanner
+
+logger = logging.getLogger(__name__)
+
+
+class DefinitionSplitter(TextSplitter):
+    """Splits Python code at class and function boundaries, as found by the
+    same `DefinitionScanner` as `File`. Each top-level definition is one
+    chunk, and code before the first definition another. Classes longer than
+    `chunk_size` characters are split at their methods, and longer functions
+    by `RecursiveCharacterTextSplitter`.
+
+    Chunks carry the relative `path` and dotted `module` of their document
+    (from the `source` metadata), the qualified `name` of their definition
+    ("" for module-level code) and their `start_line` and `end_line`."""
+
+    def __init__(self, chunk_size: int = 8000, chunk_overlap: int = 400, **kwargs):
+        super().__init__(chunk_size=chunk_size, chunk_overlap=chunk_overlap, **kwargs)
+        self._scanner = DefinitionScanner()
+        self._fallback = RecursiveCharacterTextSplitter.from_language(
+            Language.PYTHON, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        )
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for _, start, end in self.split_spans(text)]
+
+    def split_spans(self, text: str) -> List[Tuple[str, int, int]]:
+        """Chunks as (qualified name, start offset, end offset)"""
+        definitions = list(self._scanner.scan(text).values())
+        spans = []
+        for name, start, end in self._split(text, definitions, "", 0, len(text)):
+            if end - start <= self._chunk_size:
+                spans.append((name, start, end))
+                continue
+
+            # Definitions without nested definitions to split at
+            offset = start
+            for chunk in self._fallback.split_text(text[start:end]):
+                offset = text.find(chunk, offset)
+                spans.append((name, offset, offset + len(chunk)))
+        return spans
+
+    def create_documents(
+        self, texts: List[str], metadatas: Optional[List[dict]] = None
+    ) -> List[Document]:
+        metadatas = metadatas or [{}] * len(texts)
+        documents = []
+        for text, metadata in zip(texts, metadatas):
+            path = metadata.get("source", "")
+            for name, start, end in self.split_spans(text):
+                start_line = text.count("\n", 0, start) + 1
+                end_line = start_line + text[start:end].rstrip().count("\n")
+                chunk_metadata = copy.deepcopy(metadata)
+                chunk_metadata.update(
+                    path=str(path),
+                    module=self.module(path),
+                    name=name,
+                    start_line=start_line,
+                    end_line=end_line,
+                )
+                documents.append(
+                    Document(page_content=text[start:end], metadata=chunk_metadata)
+                )
+        return documents
+
+    @staticmethod
+    def module(path: str) -> str:
+        """Dotted module name of a relative path, e.g. `package.module`"""
+        parts = list(PurePath(path).with_suffix("").parts)
+        if len(parts) > 1 and parts[-1] == "__init__":
+            parts.pop()
+        return ".".join(parts)
+
+    def _split(
+        self,
+        text: str,
+        definitions: List[PyDefinition],
+        scope: str,
+        start: int,
+        end: int,
+    ) -> List[Tuple[str, int, int]]:
+        """Split the code of `scope` between `start` and `end` before each of
+        its direct children. Children that do not fit in a chunk are split in
+        turn"""
+        children = [
+            definition
+            for definition in definitions
+            if definition.key.rpartition(".")[0] == scope
+            and start <= definition.span.start < end
+        ]
+        boundaries = [start]
+        for child in children:
+            boundary = self._preamble_start(text, child.span.start)
+            boundaries.append(max(boundary, boundaries[-1]))
+        boundaries.append(end)
+
+        # Code of the scope after a child (e.g. an `if` at module level) is
+        # not part of the child, but a chunk of the scope
+        ranges = [(scope, boundaries[0], boundaries[1])]
+        for child, child_start, child_end in zip(
+            children, boundaries[1:], boundaries[2:]
+        ):
+            indent = len(child.source) - len(child.source.lstrip())
+            dedent = self._scanner.dedent_start(text, child.span.end, child_end, indent)
+            if dedent is None:
+                ranges.append((child.key, child_start, child_end))
+            else:
+                ranges.append((child.key, child_start, dedent))
+                ranges.append((scope, dedent, child_end))
+
+        spans = []
+        for name, child_start, child_end in ranges:
+            if text[child_start:child_end].strip() == "":
+                continue
+            if child_end - child_start > self._chunk_size and name != scope:
+                spans.extend(
+                    self._split(text, definitions, name, child_start, child_end)
+                )
+            else:
+                spans.append((name, child_start, child_end))
+
+        # The header of a split definition is kept with its first child
+        if (
+            scope != ""
+            and len(spans) > 1
+            and spans[0][0] == scope
+            and spans[1][2] - spans[0][1] <= self._chunk_size
+        ):
+            spans[:2] = [(spans[1][0], spans[0][1], spans[1][2])]
+        return spans
+
+    def _preamble_start(self, text: str, start: int) -> int:
+        """Start of the decorators and comments directly above a definition,
+        which belong to its chunk"""
+        line_start = text.rfind("\n", 0, start) + 1
+        while line_start > 0:
+            previous = text.rfind("\n", 0, line_start - 1) + 1
+            if not text[previous:line_start].lstrip().startswith(("@", "#")):
+                break
+            line_start = previous
+        return line_start
@@ -0,0 +1,2 @@
+from gpt4docs.modules.parsing.DefinitionScanner import DefinitionScanner
+from gpt4docs.modules.parsing.DefinitionSplitter import DefinitionSplitter
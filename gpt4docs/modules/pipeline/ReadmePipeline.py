@@ -0,0 +1,106 @@
+from pathlib import Path
+from typing import List, Optional
+import asyncio
+import logging
+
+from gpt4docs.model import ReadmeLLM
+from gpt4docs.modules.managers.VectorStoreManager import VectorStoreManager
+from gpt4docs.scripts.build_vectorstore import (
+    ChunkerEnum,
+    delete_existing_vectorstore,
+)
+from langchain.embeddings.base import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+class ReadmePipeline:
+    """Prepares the README while docstrings are still being generated. As
+    soon as a file is saved, its summary is requested from `readme_llm` and it
+    is embedded into the vectorstore at `vectorstore_path` (reusing vectors of
+    unchanged chunks from `source_path`), such that only the remaining files
+    and the README itself are left after the docstrings."""
+
+    def __init__(
+        self,
+        readme_llm: ReadmeLLM,
+        project_root: str | Path,
+        vectorstore_path: str | Path,
+        embeddings: Optional[Embeddings] = None,
+        batch_size: int = 64,
+        concurrency: int = 4,
+        incremental: bool = False,
+        source_path: Optional[str | Path] = None,
+        chunker: ChunkerEnum | str = ChunkerEnum.definition,
+    ) -> None:
+        self.readme_llm = readme_llm
+        self.project_root = Path(project_root)
+        self.vectorstore_path = Path(vectorstore_path)
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.incremental = incremental
+        self.source_path = source_path
+        self.chunker = chunker
+        self.files = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start embedding files in the background. Must be called from a
+        running event loop"""
+        if not self.incremental:
+            delete_existing_vectorstore(self.vectorstore_path)
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._embed())
+
+    def add(self, file_path: str | Path) -> None:
+        """Summarize and embed a file that was saved to the project"""
+        self.readme_llm.prefetch(self.project_root, file_path)
+        self._queue.put_nowait(Path(file_path))
+        self.files += 1
+
+    async def join(self) -> None:
+        """Wait until all added files are embedded"""
+        self._queue.put_nowait(None)
+        await self._task
+        logger.info(f"Embedded {self.files} files while generating docstrings")
+
+    async def cancel(self) -> None:
+        """Stop summarizing and embedding files, e.g. when the docstrings
+        could not be generated. Files already being embedded are finished"""
+        futures = list(self.readme_llm.prefetched.values())
+        self.readme_llm.prefetched.clear()
+        if self._task is not None:
+            futures.append(self._task)
+
+        for future in futures:
+            future.cancel()
+        await asyncio.gather(*futures, return_exceptions=True)
+        logger.info(f"Cancelled the README preparation of {self.files} files")
+
+    async def _embed(self) -> None:
+        # Files saved while the previous ones were embedded are embedded
+        # together, which keeps the number of vectorstore writes low
+        done = False
+        while not done:
+            files: List[Path] = [await self._queue.get()]
+            while not self._queue.empty():
+                files.append(self._queue.get_nowait())
+            if None in files:
+                done = True
+                files = [file for file in files if file is not None]
+            if len(files) == 0:
+                continue
+
+            await asyncio.to_thread(
+                VectorStoreManager.add,
+                self.vectorstore_path,
+                self.project_root,
+                files,
+                embeddings=self.embeddings,
+                batch_size=self.batch_size,
+                concurrency=self.concurrency,
+                source_path=self.source_path,
+                chunker=self.chunker,
+            )
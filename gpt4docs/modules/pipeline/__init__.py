@@ -0,0 +1 @@
+from gpt4docs.modules.pipeline.ReadmePipeline import ReadmePipeline
@@ -0,0 +1,45 @@
+from enum import Enum
+import re
+
+from gpt4docs.modules.datamodels import PyDefinition
+
+# Docstrings that only mark documentation as missing
+re_placeholder = re.compile(r"^\W*(todo|fixme|tbd|xxx|docstring)?\W*$", re.IGNORECASE)
+
+
+class DocstringPolicyEnum(str, Enum):
+    all = "all"  # Regenerate every docstring
+    missing = "missing"  # Only definitions without a docstring
+    short = "short"  # Missing docstrings and those shorter than a minimum length
+
+
+class DocstringPolicy:
+    """Decides which definitions get a new docstring. With `force`, every
+    definition is regenerated and cached docstrings are not reused"""
+
+    def __init__(
+        self,
+        mode: DocstringPolicyEnum | str = DocstringPolicyEnum.all,
+        min_length: int = 30,
+        force: bool = False,
+    ) -> None:
+        self.mode = DocstringPolicyEnum(mode)
+        self.min_length = min_length
+        self.force = force
+
+    def is_missing(self, definition: PyDefinition) -> bool:
+        docstring = definition.docstring
+        return docstring is None or re_placeholder.match(docstring) is not None
+
+    def is_short(self, definition: PyDefinition) -> bool:
+        """Docstrings are short if their text, with whitespace collapsed, is below
+        the minimum length"""
+        text = " ".join((definition.docstring or "").split())
+        return len(text) < self.min_length
+
+    def should_generate(self, definition: PyDefinition) -> bool:
+        if self.force or self.mode == DocstringPolicyEnum.all:
+            return True
+        if self.mode == DocstringPolicyEnum.missing:
+            return self.is_missing(definition)
+        return self.is_missing(definition) or self.is_short(definition)
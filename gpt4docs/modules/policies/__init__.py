@@ -0,0 +1,4 @@
+from gpt4docs.modules.policies.DocstringPolicy import (
+    DocstringPolicy,
+    DocstringPolicyEnum,
+)
@@ -0,0 +1,99 @@
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+
+from langchain.schema import BaseRetriever, Document
+
+from gpt4docs.modules.datamodels import PyDefinition
+from gpt4docs.modules.directory import File
+
+logger = logging.getLogger(__name__)
+
+# Shared queries are built from definition headers, truncated to stay well
+# within the input limit of the embedding model
+MAX_QUERY_CHARACTERS = 8000
+
+
+class ContextScopeEnum(str, Enum):
+    definition = "definition"  # One query per request
+    class_ = "class"  # One query per class, or module-level functions
+    file = "file"  # One query per file
+
+
+class ContextRetriever:
+    """Retrieves the documents used as context for docstrings. Context is
+    shared by all definitions of the same file or class, so only one query is
+    embedded for each. With `blend_retriever`, documents retrieved for each
+    definition are added to the shared context."""
+
+    def __init__(
+        self,
+        retriever: BaseRetriever,
+        scope: ContextScopeEnum | str = ContextScopeEnum.definition,
+        blend_retriever: Optional[BaseRetriever] = None,
+    ) -> None:
+        self.retriever = retriever
+        self.scope = ContextScopeEnum(scope)
+        self.blend_retriever = blend_retriever
+        self.queries = 0
+
+        # Shared context by file path and scope. Tasks are stored, such that
+        # concurrent requests for the same context wait for the same query
+        self._shared: Dict[Tuple[str, str], asyncio.Task] = {}
+
+    async def aget_documents(
+        self, file: File, definitions: List[PyDefinition]
+    ) -> List[Document]:
+        """Documents to use as context for the definitions of the file"""
+        if self.scope == ContextScopeEnum.definition:
+            query = "\n".join(definition.source for definition in definitions)
+            return await self._aquery(self.retriever, query)
+
+        scope = "" if self.scope == ContextScopeEnum.file else definitions[0].scope
+        key = (str(file.file_path), scope)
+        if key not in self._shared:
+            query = self._shared_query(file, scope)
+            self._shared[key] = asyncio.ensure_future(
+                self._aquery(self.retriever, query)
+            )
+        documents = await self._shared[key]
+
+        if self.blend_retriever is not None:
+            query = "\n".join(definition.source for definition in definitions)
+            documents = self._merge(
+                documents, await self._aquery(self.blend_retriever, query)
+            )
+        return documents
+
+    def release(self, file: File) -> None:
+        """Forget the shared context of a file once its docstrings are done"""
+        path = str(file.file_path)
+        for key in [key for key in self._shared if key[0] == path]:
+            del self._shared[key]
+
+    def _shared_query(self, file: File, scope: str) -> str:
+        """Query from the headers of all definitions in the scope"""
+        sources = [
+            definition.source
+            for definition in file.definitions.values()
+            if self.scope == ContextScopeEnum.file or definition.scope == scope
+        ]
+        return "\n".join(sources)[:MAX_QUERY_CHARACTERS]
+
+    async def _aquery(self, retriever: BaseRetriever, query: str) -> List[Document]:
+        self.queries += 1
+        return await retriever.aget_relevant_documents(query)
+
+    def _merge(
+        self, documents: List[Document], other: List[Document]
+    ) -> List[Document]:
+        """Documents followed by the other documents that are not already
+        included"""
+        contents = {document.page_content for document in documents}
+        return documents + [
+            document for document in other if document.page_content not in contents
+        ]
+
+    def summary(self) -> str:
+        return f"{self.queries} retrieval queries (context scope: {self.scope.value})"
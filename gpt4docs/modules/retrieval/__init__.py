@@ -0,0 +1,4 @@
+from gpt4docs.modules.retrieval.ContextRetriever import (
+    ContextRetriever,
+    ContextScopeEnum,
+)
@@ -0,0 +1,63 @@
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveLimiter:
+    """Limits the number of requests in flight with additive increase and
+    multiplicative decrease (AIMD). The limit grows by one after a full limit
+    of successful requests and is multiplied by `decrease` when requests are
+    rate limited, between `min_concurrency` and `max_concurrency`."""
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        min_concurrency: int = 1,
+        decrease: float = 0.5,
+    ) -> None:
+        if not 1 <= min_concurrency <= max_concurrency:
+            raise ValueError(
+                "Concurrency limits must satisfy 1 <= minimum <= maximum, got "
+                f"{min_concurrency} and {max_concurrency}"
+            )
+        if not 0 < decrease < 1:
+            raise ValueError(f"Decrease must be between 0 and 1, got {decrease}")
+
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.decrease = decrease
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.decreases = 0
+        self._last_decrease = float("-inf")
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Wait until a request may be sent, and yield the time it started"""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            yield time.monotonic()
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    def on_success(self) -> None:
+        self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+    def on_rate_limit(self, started: float) -> None:
+        """Decrease the limit after a request that started at `started` was
+        rate limited. Requests sent before the last decrease saw the old limit,
+        so they do not decrease it again."""
+        if started < self._last_decrease:
+            return
+        self.limit = max(self.min_concurrency, self.limit * self.decrease)
+        self._last_decrease = time.monotonic()
+        self.decreases += 1
+        logger.info(f"Rate limited, decreased concurrency to {int(self.limit)}")
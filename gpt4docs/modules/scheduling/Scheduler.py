@@ -0,0 +1,129 @@
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+import asyncio
+import logging
+import random
+
+import openai
+
+from gpt4docs.modules.scheduling.AdaptiveLimiter import AdaptiveLimiter
+from gpt4docs.modules.scheduling.TokenBudget import TokenBudget
+
+logger = logging.getLogger(__name__)
+
+# Errors of a single request that may succeed when retried
+RETRYABLE_ERRORS = (
+    openai.error.RateLimitError,
+    openai.error.Timeout,
+    openai.error.APIError,
+    openai.error.APIConnectionError,
+    openai.error.ServiceUnavailableError,
+    asyncio.TimeoutError,
+)
+# Errors after which a request is given up on, instead of failing the run
+REQUEST_ERRORS = RETRYABLE_ERRORS + (openai.error.InvalidRequestError,)
+# Errors that signal too many requests in flight
+RATE_LIMIT_ERRORS = (
+    openai.error.RateLimitError,
+    openai.error.Timeout,
+    asyncio.TimeoutError,
+)
+
+
+class Scheduler:
+    """Runs jobs from one project-wide queue with a bounded number of jobs in
+    flight and an optional token-per-minute budget. Requests sent with `call`
+    are limited adaptively and retried with jittered exponential backoff."""
+
+    def __init__(
+        self,
+        concurrency: int = 16,
+        tokens_per_minute: Optional[int] = None,
+        max_retries: int = 5,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        timeout: Optional[float] = None,
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("Concurrency must be at least 1")
+        if max_retries < 0:
+            raise ValueError("Max retries must not be negative")
+
+        self.concurrency = concurrency
+        self.token_budget = (
+            TokenBudget(tokens_per_minute) if tokens_per_minute is not None else None
+        )
+        self.limiter = AdaptiveLimiter(concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.retries = 0
+
+    async def map(
+        self, func: Callable[[Any], Awaitable[Any]], items: Iterable[Any]
+    ) -> List[Any]:
+        """Run `func` on every item and return the results in the same order.
+        Items are taken as workers become free, so `items` may be a lazy
+        iterator"""
+        items = enumerate(items)
+        results = {}
+
+        async def worker():
+            # Workers share the iterator, which only advances between awaits
+            for index, item in items:
+                results[index] = await func(item)
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            raise
+
+        logger.debug(f"Ran {len(results)} jobs on {len(workers)} workers")
+        return [results[index] for index in range(len(results))]
+
+    async def acquire_tokens(self, tokens: int) -> None:
+        """Wait until `tokens` can be spent within the token-per-minute budget"""
+        if self.token_budget is not None:
+            await self.token_budget.acquire(tokens)
+
+    async def call(self, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Send a request `func(*args, **kwargs)` within the adaptive
+        concurrency limit. Retryable errors are retried up to `max_retries`
+        times before they are raised."""
+        for attempt in range(self.max_retries + 1):
+            async with self.limiter.slot() as started:
+                try:
+                    result = await asyncio.wait_for(
+                        func(*args, **kwargs), timeout=self.timeout
+                    )
+                except RETRYABLE_ERRORS as e:
+                    if isinstance(e, RATE_LIMIT_ERRORS):
+                        self.limiter.on_rate_limit(started)
+                    if attempt == self.max_retries:
+                        raise
+                    error = e
+                else:
+                    self.limiter.on_success()
+                    return result
+
+            delay = self._delay(attempt, error)
+            self.retries += 1
+            logger.debug(
+                f"Retrying in {delay:.1f}s after {type(error).__name__}: {error}"
+            )
+            await asyncio.sleep(delay)
+
+    def _delay(self, attempt: int, error: Exception) -> float:
+        """Full jitter exponential backoff, but at least the delay the server
+        asked for"""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+        headers = getattr(error, "headers", None) or {}
+        try:
+            retry_after = float(headers.get("retry-after", 0))
+        except ValueError:
+            retry_after = 0
+        return max(delay, min(retry_after, self.max_backoff))
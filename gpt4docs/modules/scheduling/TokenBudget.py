@@ -0,0 +1,37 @@
+import asyncio
+import time
+
+# Rough number of characters per token, used to estimate token counts and
+# sizes of texts without a tokenizer
+CHARACTERS_PER_TOKEN = 4
+
+
+class TokenBudget:
+    """Token bucket limiting the number of tokens spent per minute. Requests
+    wait in order until enough tokens have been refilled"""
+
+    def __init__(self, tokens_per_minute: int) -> None:
+        if tokens_per_minute <= 0:
+            raise ValueError("Tokens per minute must be positive")
+
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60
+        self.tokens = tokens_per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: int) -> None:
+        # A single request larger than the budget would otherwise wait forever
+        tokens = min(tokens, self.capacity)
+
+        async with self._lock:
+            self._refill()
+            while self.tokens < tokens:
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= tokens
@@ -0,0 +1,3 @@
+from gpt4docs.modules.scheduling.AdaptiveLimiter import AdaptiveLimiter
+from gpt4docs.modules.scheduling.TokenBudget import TokenBudget
+from gpt4docs.modules.scheduling.Scheduler import Scheduler
@@ -0,0 +1,139 @@
+from pathlib import Path
+from typing import Dict
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import tempfile
+
+import gpt4docs
+from gpt4docs.model import LLMBackend
+from gpt4docs.modules.directory import Project
+from gpt4docs.modules.embeddings import HashingEmbeddings
+from gpt4docs.modules.managers import LLMManager, VectorStoreManager
+from gpt4docs.modules.metrics import RunMetrics
+from gpt4docs.modules.scheduling import Scheduler
+from gpt4docs.scripts.build_vectorstore import build_vectorstore
+from gpt4docs.scripts.generate_project import generate_project
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def run_benchmark(args, directory: Path) -> Dict:
+    """Generate a synthetic project in `directory` and time each stage of the
+    pipeline on it. The LLM is the fake backend and embeddings are local, so
+    no network access is needed."""
+    metrics = RunMetrics()
+    root = directory / "project"
+
+    with metrics.stage("generate"):
+        generate_project(
+            root,
+            files=args.files,
+            definitions=args.definitions,
+            depth=args.depth,
+            docstring_ratio=args.docstring_ratio,
+            seed=args.seed,
+        )
+
+    with metrics.stage("project_load"):
+        project = Project(root, workers=args.workers, metrics=metrics)
+    files = list(project.files.values())
+
+    with metrics.stage("scan"):
+        for file in files:
+            file._scan_for_definitions()
+
+    for file in files:
+        for name in file.definitions:
+            file.set_docstring(name, "New docstring\nwith two lines")
+
+    with metrics.stage("file_save"):
+        for index, file in enumerate(files):
+            file.save(directory / f"saved_{index}.py")
+
+    with metrics.stage("project_save"):
+        project.save()
+
+    embeddings = HashingEmbeddings()
+    with metrics.stage("vectorstore_build"):
+        build_vectorstore(directory / "vectorstore", root, embeddings=embeddings)
+
+    llm_manager = LLMManager(
+        VectorStoreManager(directory / "vectorstore", embeddings=embeddings),
+        scheduler=Scheduler(args.concurrency),
+        batch_size=args.batch_size,
+        llm_backend=LLMBackend(
+            "fake", latency=args.llm_latency, rate_limit=args.llm_rate_limit
+        ),
+        metrics=metrics,
+    )
+    with metrics.stage("docstring_pass"):
+        asyncio.run(llm_manager.generate_docstrings(files))
+
+    report = metrics.report()
+    return {
+        "version": gpt4docs.__version__,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "counts": {
+            "files": len(files),
+            "definitions": sum(len(file.definitions) for file in files),
+            "lines": sum(file.content.count("\n") for file in files),
+        },
+        "timings": report["stages"],
+        "latencies": report["latencies"],
+        "tokens": report["tokens"],
+        "counters": report["counters"],
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark gpt4docs on a synthetic project"
+    )
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--definitions", type=int, default=20)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--docstring_ratio", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--batch_size", type=int, default=1)
+    parser.add_argument(
+        "--llm_latency",
+        type=float,
+        default=0.05,
+        help="Simulated latency in seconds of each LLM response",
+    )
+    parser.add_argument(
+        "--llm_rate_limit",
+        type=int,
+        default=None,
+        help="Simulated number of requests in flight the LLM accepts",
+    )
+    parser.add_argument(
+        "--output", type=Path, default=None, help="JSON file for the results"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        results = run_benchmark(args, Path(directory))
+
+    output = json.dumps(results, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        args.output.write_text(output)
+        logger.info(f"Saved results to {args.output}")
@@ -1,6 +1,19 @@
-from typing import Generator
+from collections import deque
+from enum import Enum
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+import hashlib
+import json
 import time
-import uuid
 from pathlib import Path
 import shutil
 import logging
@@ -8,11 +21,20 @@ import logging
 from dotenv import load_dotenv
 
 from langchain.vectorstores import Chroma
+from langchain.embeddings.base import Embeddings
 from langchain.embeddings.openai import OpenAIEmbeddings
-from langchain.text_splitter import TokenTextSplitter
+from langchain.schema import Document
+from langchain.text_splitter import (
+    RecursiveCharacterTextSplitter,
+    TextSplitter,
+    TokenTextSplitter,
+)
 from langchain.document_loaders.parsers.txt import TextParser
 from langchain.document_loaders.blob_loaders import Blob
 
+from gpt4docs.modules.parsing import DefinitionSplitter
+from gpt4docs.modules.scheduling.TokenBudget import CHARACTERS_PER_TOKEN
+
 load_dotenv()
 
 logging.basicConfig(
@@ -27,6 +49,16 @@ logger = logging.getLogger(__name__)
 
 root = Path(__file__).parent.parent.parent
 
+MANIFEST_FILE = "manifest.json"
+
+# Number of chunks written to the vectorstore at once
+WRITE_BATCH_SIZE = 1000
+
+
+class ChunkerEnum(str, Enum):
+    definition = "definition"  # At class and function boundaries
+    token = "token"  # Fixed number of tokens
+
 
 def delete_existing_vectorstore(directory: Path):
     if directory.exists():
@@ -34,19 +66,86 @@ def delete_existing_vectorstore(directory: Path):
         logger.info(f"Deleted existing vectorstore at {directory}")
 
 
+def document_id(path: str, content: bytes) -> str:
+    """Hash the relative path and raw content of a document, used as its
+    `doc_id`. Chunks carry their path and module, so moved documents are
+    embedded again, and documents with the same content are kept apart"""
+    return hashlib.sha256(path.encode("utf-8") + b"\0" + content).hexdigest()
+
+
+def find_documents(folder: Path) -> Iterable[Path]:
+    """Find all documents in the given folder that should be embedded"""
+    for file in folder.glob("**/*.py"):
+        if file.name == "__init__.py":
+            continue
+
+        if file.is_file():
+            yield file
+
+
+def is_empty(file: Path) -> bool:
+    """Whether the document has no content to embed"""
+    return file.read_bytes().strip() == b""
+
+
+def scan_documents(folder: Path) -> Dict[str, str]:
+    """Map every document in the folder (relative path) to its `doc_id`"""
+    documents = {}
+    for file in find_documents(folder):
+        path = str(file.relative_to(folder))
+        documents[path] = document_id(path, file.read_bytes())
+    return documents
+
+
+def load_manifest(directory: Path) -> Dict:
+    """Load the manifest of embedded documents stored with the vectorstore"""
+    manifest_path = Path(directory) / MANIFEST_FILE
+    if not manifest_path.exists():
+        return {}
+
+    with open(manifest_path, "r") as f:
+        return json.load(f)
+
+
+def manifest_settings(
+    chunk_size: int, embeddings: Embeddings, chunker: ChunkerEnum | str
+) -> Dict:
+    """Settings of a vectorstore. Vectors built with different settings cannot
+    be mixed"""
+    return {
+        "chunk_size": chunk_size,
+        "embeddings": getattr(embeddings, "model", type(embeddings).__name__),
+        "chunker": ChunkerEnum(chunker).value,
+    }
+
+
+def is_compatible(manifest: Dict, settings: Dict) -> bool:
+    return all(manifest.get(key) == value for key, value in settings.items())
+
+
+def save_manifest(directory: Path, manifest: Dict):
+    manifest_path = Path(directory) / MANIFEST_FILE
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
 def load_documents_from_folder(
-    folder: Path, docs_per_iter: int
+    folder: Path, docs_per_iter: int, files: Optional[Iterable[Path]] = None
 ) -> Generator[Blob, None, None]:
-    """Loads documents in the given folder"""
+    """Loads documents in the given folder, with their path relative to the
+    folder as source. If `files` is given, only those documents are loaded"""
     docs_count = 0
     documents = []
 
-    for file in folder.glob("**/*.py"):
-        if file.name == "__init__.py":
-            continue
+    if files is None:
+        files = find_documents(folder)
 
+    for file in files:
         if file.is_file():
-            documents.append(Blob(data=file.read_bytes(), path=file.name))
+            path = str(file.relative_to(folder))
+            documents.append(Blob(data=file.read_bytes(), path=path))
             docs_count += 1
 
             if docs_count % docs_per_iter == 0:
@@ -71,7 +170,7 @@ def read_documents(documents_generator: Generator) -> Generator:
         documents = []
         for document in documents_blob:
             parsed_docs = parser.parse(document)
-            doc_id = str(uuid.uuid4())
+            doc_id = document_id(str(document.path), document.as_bytes())
             for doc in parsed_docs:
                 doc.metadata["doc_id"] = doc_id
             documents.extend(parsed_docs)
@@ -79,50 +178,433 @@ def read_documents(documents_generator: Generator) -> Generator:
         yield documents
 
 
+def split_documents(
+    documents_generator: Generator, text_splitter: TextSplitter
+) -> Generator[Tuple[str, Document], None, None]:
+    """Split documents into chunks, with ids made of their `doc_id` and index"""
+    for documents in documents_generator:
+        for document in documents:
+            chunks = text_splitter.split_documents([document])
+            for index, chunk in enumerate(chunks):
+                yield f"{chunk.metadata['doc_id']}:{index}", chunk
+
+
+def batched(iterable: Iterable, size: int) -> Generator[List, None, None]:
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if len(batch) > 0:
+        yield batch
+
+
+def upsert_vectors(
+    vectorstore: Chroma,
+    ids: List[str],
+    vectors: List[List[float]],
+    documents: List[Document],
+):
+    """Write chunks with their precomputed vectors. Chroma in langchain
+    0.0.261 only adds texts that it embeds itself, so this goes through its
+    chromadb 0.4.5 collection; revisit when upgrading either"""
+    vectorstore._collection.upsert(
+        ids=ids,
+        embeddings=vectors,
+        documents=[document.page_content for document in documents],
+        metadatas=[document.metadata for document in documents],
+    )
+
+
+def write_embeddings(
+    vectorstore: Chroma,
+    chunks: Iterable[Tuple[str, Document]],
+    embeddings: Embeddings,
+    batch_size: int = 64,
+    concurrency: int = 4,
+    reuse: Optional[Callable[[Document], Optional[List[float]]]] = None,
+) -> int:
+    """Embed chunks in batches of `batch_size` with up to `concurrency`
+    requests in flight, and write them to the vectorstore in bulk. Chunks are
+    read from `chunks` while earlier batches are being embedded. Chunks for
+    which `reuse` returns a vector are written without embedding them. Returns
+    the number of chunks written"""
+    count = 0
+    reused = 0
+    pending: Deque[Tuple[List[Tuple[str, Document]], Future]] = deque()
+    buffer: List[Tuple[Tuple[str, Document], List[float]]] = []
+
+    def flush():
+        ids = [chunk_id for (chunk_id, _), _ in buffer]
+        upsert_vectors(
+            vectorstore,
+            ids,
+            [vector for _, vector in buffer],
+            [chunk for (_, chunk), _ in buffer],
+        )
+        logger.debug(f"Wrote {len(ids)} chunks")
+        buffer.clear()
+
+    def collect():
+        nonlocal count
+        batch, future = pending.popleft()
+        buffer.extend(zip(batch, future.result()))
+        count += len(batch)
+        if len(buffer) >= WRITE_BATCH_SIZE:
+            flush()
+
+    def unembedded():
+        nonlocal count, reused
+        for chunk_id, chunk in chunks:
+            vector = reuse(chunk) if reuse is not None else None
+            if vector is None:
+                yield chunk_id, chunk
+                continue
+            buffer.append(((chunk_id, chunk), vector))
+            count += 1
+            reused += 1
+            if len(buffer) >= WRITE_BATCH_SIZE:
+                flush()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for batch in batched(unembedded(), batch_size):
+            texts = [chunk.page_content for _, chunk in batch]
+            pending.append((batch, executor.submit(embeddings.embed_documents, texts)))
+
+            # Bound the number of batches in memory
+            if len(pending) >= 2 * concurrency:
+                collect()
+
+        while len(pending) > 0:
+            collect()
+
+    if len(buffer) > 0:
+        flush()
+    if reused > 0:
+        logger.info(f"Reused vectors of {reused} of {count} chunks")
+    return count
+
+
+def make_text_splitter(
+    chunk_size: int,
+    chunk_overlap: int,
+    chunker: ChunkerEnum | str = ChunkerEnum.definition,
+) -> TextSplitter:
+    """Split at definitions, or by tokens, or approximately by characters if
+    the tokenizer cannot be downloaded (e.g. without network access)"""
+    if ChunkerEnum(chunker) == ChunkerEnum.definition:
+        return DefinitionSplitter(
+            chunk_size=chunk_size * CHARACTERS_PER_TOKEN,
+            chunk_overlap=chunk_overlap * CHARACTERS_PER_TOKEN,
+        )
+    try:
+        return TokenTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    except OSError as e:
+        logger.warning(f"Tokenizer unavailable, splitting by characters: {e}")
+        return RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size * CHARACTERS_PER_TOKEN,
+            chunk_overlap=chunk_overlap * CHARACTERS_PER_TOKEN,
+        )
+
+
 def embed_documents(
     documents_generator: Generator,
     chunk_size: int = 500,
     chunk_overlap: int = 100,
     persist_directory=root / "data" / ".chroma/",
+    embeddings: Optional[Embeddings] = None,
+    batch_size: int = 64,
+    concurrency: int = 4,
+    reuse: Optional[Callable[[Document], Optional[List[float]]]] = None,
+    chunker: ChunkerEnum | str = ChunkerEnum.definition,
 ):
     # Create vectorstore for documents
-    text_splitter = TokenTextSplitter(
-        chunk_size=chunk_size, chunk_overlap=chunk_overlap
-    )
+    text_splitter = make_text_splitter(chunk_size, chunk_overlap, chunker)
+
+    if embeddings is None:
+        embeddings = OpenAIEmbeddings()
 
     vectorstore = Chroma(
         collection_name="documents",
-        embedding_function=OpenAIEmbeddings(),
+        embedding_function=embeddings,
         persist_directory=str(persist_directory),
     )
 
-    for documents in documents_generator:
-        split_docs = text_splitter.split_documents(documents)
-
-        if len(split_docs) == 0:
-            raise ValueError("Documents couldn't be read")
-
-        logger.info(f"Split into {len(split_docs)} documents")
-        logger.info("Embedding documents...")
+    logger.info(
+        f"Embedding documents in batches of {batch_size} with concurrency "
+        f"{concurrency}..."
+    )
+    count = write_embeddings(
+        vectorstore,
+        split_documents(documents_generator, text_splitter),
+        embeddings,
+        batch_size=batch_size,
+        concurrency=concurrency,
+        reuse=reuse,
+    )
 
-        vectorstore.add_documents(split_docs)
+    # Documents without content (e.g. empty modules) have no chunks
+    if count == 0:
+        logger.warning("Documents had no content to embed")
+    logger.info(f"Embedded {count} chunks")
 
     vectorstore.persist()
     logger.info(f"Persisted vectorstore to {persist_directory}")
     vectorstore = None
 
 
+def delete_documents(
+    persist_directory: Path,
+    doc_ids: Iterable[str],
+    embeddings: Optional[Embeddings] = None,
+):
+    """Delete all chunks belonging to the given `doc_id`s"""
+    vectorstore = Chroma(
+        collection_name="documents",
+        embedding_function=embeddings or OpenAIEmbeddings(),
+        persist_directory=str(persist_directory),
+    )
+
+    chunks_count = 0
+    for doc_id in doc_ids:
+        ids = vectorstore.get(where={"doc_id": doc_id}, include=[])["ids"]
+        if len(ids) > 0:
+            vectorstore.delete(ids)
+            chunks_count += len(ids)
+
+    vectorstore.persist()
+    logger.info(f"Deleted {chunks_count} outdated chunks from {persist_directory}")
+
+
+def source_vectors(
+    source_directory: Optional[Path],
+    documents_folder: Path,
+    new_documents: Dict[str, Path],
+    settings: Dict,
+    embeddings: Embeddings,
+) -> Optional[Callable[[Document], Optional[List[float]]]]:
+    """Look up the vectors of chunks in the vectorstore at `source_directory`,
+    among the chunks of the source document at the same relative path as the
+    new document. Only chunks with the same text are reused, so a stale source
+    never gives wrong vectors. Returns None if there is no compatible source"""
+    if source_directory is None:
+        return None
+
+    manifest = load_manifest(source_directory)
+    if not is_compatible(manifest, settings):
+        logger.info(f"No compatible vectorstore to reuse at {source_directory}")
+        return None
+
+    source_files = manifest["files"]
+    source_doc_ids = {}
+    for doc_id, file in new_documents.items():
+        path = str(Path(file).relative_to(documents_folder))
+        if path in source_files:
+            source_doc_ids[doc_id] = source_files[path]
+
+    source = Chroma(
+        collection_name="documents",
+        embedding_function=embeddings,
+        persist_directory=str(source_directory),
+    )
+    # Chunks arrive document by document, so only the vectors of the current
+    # source document are kept in memory
+    loaded: Dict[str, Dict[str, List[float]]] = {}
+
+    def reuse(chunk: Document) -> Optional[List[float]]:
+        doc_id = source_doc_ids.get(chunk.metadata["doc_id"])
+        if doc_id is None:
+            return None
+        if doc_id not in loaded:
+            result = source.get(
+                where={"doc_id": doc_id}, include=["embeddings", "documents"]
+            )
+            loaded.clear()
+            loaded[doc_id] = dict(zip(result["documents"], result["embeddings"]))
+        return loaded[doc_id].get(chunk.page_content)
+
+    return reuse
+
+
 def build_vectorstore(
     persist_directory: Path,
     documents_folder: Path,
     chunk_size=2000,
     docs_per_iter=25,
+    incremental=False,
+    embeddings: Optional[Embeddings] = None,
+    batch_size: int = 64,
+    concurrency: int = 4,
+    source_directory: Optional[Path] = None,
+    chunker: ChunkerEnum | str = ChunkerEnum.definition,
 ):
-    logger.info(f"Building vectorstore with chunk size: {chunk_size}")
+    """Embed the documents of the folder, split into chunks by `chunker`. If
+    `source_directory` is given, the vectors of chunks that did not change
+    from the vectorstore there are copied instead of embedded again, e.g. from
+    the vectorstore of the project before docstrings were added"""
+    persist_directory = Path(persist_directory)
+    documents_folder = Path(documents_folder)
+    if embeddings is None:
+        embeddings = OpenAIEmbeddings()
+    settings = manifest_settings(chunk_size, embeddings, chunker)
+    logger.info(
+        f"Building vectorstore with {settings['chunker']} chunks of size "
+        f"{chunk_size} and {settings['embeddings']}"
+    )
 
-    delete_existing_vectorstore(persist_directory)
+    # Vectors of different models or chunks cannot be mixed
+    manifest = load_manifest(persist_directory) if incremental else {}
+    if not is_compatible(manifest, settings):
+        if incremental:
+            logger.info("No compatible manifest found. Rebuilding vectorstore")
+        delete_existing_vectorstore(persist_directory)
+        manifest = {}
+
+    # Documents are identified by the hash of their path and content, which is
+    # also the `doc_id` of their chunks. Only new or moved documents are
+    # embedded and only chunks of documents no longer in the folder are deleted.
+    embedded = set(manifest.get("files", {}).values())
+    documents = scan_documents(documents_folder)
+
+    if len(documents) == 0:
+        raise ValueError("No documents found in folder")
+
+    outdated = embedded - set(documents.values())
+    new_documents = {}
+    for path, doc_id in documents.items():
+        if doc_id in embedded or doc_id in new_documents:
+            continue
+        # Empty files have no chunks, but are recorded as embedded
+        if not is_empty(documents_folder / path):
+            new_documents[doc_id] = documents_folder / path
 
-    documents_blob = load_documents_from_folder(documents_folder, docs_per_iter)
+    logger.info(
+        f"Found {len(documents)} documents: {len(new_documents)} new or changed, "
+        f"{len(outdated)} removed or outdated"
+    )
+
+    if len(embedded) > 0 and len(outdated | set(new_documents)) > 0:
+        # New documents may have been partially embedded by an interrupted build
+        delete_documents(
+            persist_directory, outdated | set(new_documents), embeddings=embeddings
+        )
+
+    if len(new_documents) > 0:
+        embed_new_documents(
+            persist_directory,
+            documents_folder,
+            new_documents.values(),
+            chunk_size=chunk_size,
+            docs_per_iter=docs_per_iter,
+            embeddings=embeddings,
+            batch_size=batch_size,
+            concurrency=concurrency,
+            reuse=source_vectors(
+                source_directory,
+                documents_folder,
+                new_documents,
+                settings,
+                embeddings,
+            ),
+            chunker=chunker,
+        )
+
+    save_manifest(
+        persist_directory,
+        {**settings, "files": documents},
+    )
+    logger.info("Successfully built vectorstore")
+
+
+def add_documents(
+    persist_directory: Path,
+    documents_folder: Path,
+    files: Iterable[Path],
+    chunk_size=2000,
+    embeddings: Optional[Embeddings] = None,
+    batch_size: int = 64,
+    concurrency: int = 4,
+    source_directory: Optional[Path] = None,
+    chunker: ChunkerEnum | str = ChunkerEnum.definition,
+):
+    """Embed some files of the folder, e.g. as soon as they are written, and
+    record them in the manifest such that a later incremental build only
+    embeds the remaining files. Vectors are reused from `source_directory` as
+    in `build_vectorstore`"""
+    persist_directory = Path(persist_directory)
+    documents_folder = Path(documents_folder)
+    if embeddings is None:
+        embeddings = OpenAIEmbeddings()
+    settings = manifest_settings(chunk_size, embeddings, chunker)
+
+    manifest = load_manifest(persist_directory)
+    if not is_compatible(manifest, settings):
+        delete_existing_vectorstore(persist_directory)
+        manifest = {**settings, "files": {}}
+    documents = manifest["files"]
+
+    new_documents = {}
+    replaced = set()
+    for file in files:
+        if Path(file).name == "__init__.py":
+            continue
+        path = str(Path(file).relative_to(documents_folder))
+        doc_id = document_id(path, Path(file).read_bytes())
+        if documents.get(path) not in (None, doc_id):
+            replaced.add(documents[path])
+        # Empty files have no chunks, but are recorded as embedded
+        if (
+            not is_empty(Path(file))
+            and doc_id not in documents.values()
+            and doc_id not in new_documents
+        ):
+            new_documents[doc_id] = Path(file)
+        documents[path] = doc_id
+
+    # Chunks of replaced content that no other file shares are outdated
+    outdated = replaced - set(documents.values())
+    if len(outdated | set(new_documents)) > 0 and persist_directory.exists():
+        delete_documents(
+            persist_directory, outdated | set(new_documents), embeddings=embeddings
+        )
+
+    if len(new_documents) > 0:
+        embed_new_documents(
+            persist_directory,
+            documents_folder,
+            new_documents.values(),
+            chunk_size=chunk_size,
+            embeddings=embeddings,
+            batch_size=batch_size,
+            concurrency=concurrency,
+            reuse=source_vectors(
+                source_directory,
+                documents_folder,
+                new_documents,
+                settings,
+                embeddings,
+            ),
+            chunker=chunker,
+        )
+    save_manifest(persist_directory, manifest)
+
+
+def embed_new_documents(
+    persist_directory: Path,
+    documents_folder: Path,
+    files: Iterable[Path],
+    chunk_size=2000,
+    docs_per_iter=25,
+    embeddings: Optional[Embeddings] = None,
+    batch_size: int = 64,
+    concurrency: int = 4,
+    reuse: Optional[Callable[[Document], Optional[List[float]]]] = None,
+    chunker: ChunkerEnum | str = ChunkerEnum.definition,
+):
+    documents_blob = load_documents_from_folder(
+        documents_folder, docs_per_iter, files=files
+    )
 
     documents = read_documents(documents_blob)
 
@@ -131,11 +613,14 @@ def build_vectorstore(
         documents,
         chunk_size=chunk_size,
         persist_directory=persist_directory,
+        embeddings=embeddings,
+        batch_size=batch_size,
+        concurrency=concurrency,
+        reuse=reuse,
+        chunker=chunker,
     )
     logger.info(f"embed_documents took {time.time() - start_time:.2f} seconds")
 
-    logger.info("Successfully built vectorstore")
-
 
 if __name__ == "__main__":
     logger.info(f"Root: {root}")
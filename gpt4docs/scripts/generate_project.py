@@ -0,0 +1,128 @@
+from pathlib import Path
+from typing import List
+import argparse
+import random
+
+# Statements used as bodies of generated definitions
+BODIES = [
+    "result = {arg} * 2\n{indent}return result",
+    "if {arg} is None:\n{indent}    raise ValueError('{name} needs a value')\n"
+    "{indent}return {arg}",
+    "values = [{arg}, {arg} + 1]\n{indent}return sum(values)",
+    "for item in range(3):\n{indent}    {arg} += item\n{indent}return {arg}",
+    "text = f'{name}: {{{arg}}}'\n{indent}return text.upper()",
+]
+WORDS = (
+    "load save parse render fetch build scan merge split index cache format "
+    "update resolve report file project token weather user order query node"
+).split()
+
+
+def make_name(rng: random.Random, words: int = 2) -> str:
+    return "_".join(rng.choice(WORDS) for _ in range(words))
+
+
+def make_function(
+    rng: random.Random, name: str, indent: str, docstring: bool, method: bool
+) -> str:
+    arg = rng.choice(["value", "count", "item", "data"])
+    args = f"self, {arg}" if method else f"{arg}: int = 0"
+    body_indent = indent + " " * 4
+
+    lines = [f"{indent}def {name}({args}):"]
+    if docstring:
+        lines.append(f'{body_indent}"""{name.replace("_", " ").capitalize()}."""')
+    body = rng.choice(BODIES).format(arg=arg, name=name, indent=body_indent)
+    lines.append(f"{body_indent}{body}")
+    return "\n".join(lines)
+
+
+def make_module(rng: random.Random, definitions: int, docstring_ratio: float) -> str:
+    """Generate a module with about `definitions` functions, classes and
+    methods, of which `docstring_ratio` have a docstring"""
+    parts = ["import os\n"]
+    count = 0
+    while count < definitions:
+        name = make_name(rng)
+        if rng.random() < 0.3 and definitions - count >= 2:
+            # Class with methods
+            methods = min(rng.randint(1, 4), definitions - count - 1)
+            lines = [f"class {name.title().replace('_', '')}:"]
+            if rng.random() < docstring_ratio:
+                lines.append(f'    """{name.replace("_", " ").capitalize()}."""')
+            lines.append("")
+            for index in range(methods):
+                method = make_function(
+                    rng,
+                    f"{make_name(rng)}_{index}",
+                    "    ",
+                    rng.random() < docstring_ratio,
+                    method=True,
+                )
+                lines.append(method + "\n")
+            parts.append("\n".join(lines))
+            count += methods + 1
+        else:
+            parts.append(
+                make_function(
+                    rng,
+                    f"{name}_{count}",
+                    "",
+                    rng.random() < docstring_ratio,
+                    method=False,
+                )
+                + "\n"
+            )
+            count += 1
+    return "\n\n".join(parts)
+
+
+def generate_project(
+    root: Path,
+    files: int = 100,
+    definitions: int = 20,
+    depth: int = 2,
+    docstring_ratio: float = 0.5,
+    seed: int = 0,
+) -> List[Path]:
+    """Generate a synthetic package in `root` with `files` modules of
+    `definitions` definitions each, spread over packages nested up to `depth`
+    levels. The same arguments generate the same package."""
+    rng = random.Random(seed)
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+
+    packages = [root]
+    paths = []
+    for index in range(files):
+        parent = rng.choice(packages)
+        if len(parent.relative_to(root).parts) < depth and rng.random() < 0.2:
+            parent = parent / f"package_{len(packages)}"
+            parent.mkdir()
+            (parent / "__init__.py").write_text("")
+            packages.append(parent)
+
+        path = parent / f"module_{index}.py"
+        path.write_text(make_module(rng, definitions, docstring_ratio))
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic package")
+    parser.add_argument("root", type=Path, help="Directory to generate it in")
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--definitions", type=int, default=20)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--docstring_ratio", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate_project(
+        args.root,
+        args.files,
+        args.definitions,
+        args.depth,
+        args.docstring_ratio,
+        args.seed,
+    )
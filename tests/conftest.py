@@ -1,5 +1,6 @@
 import pytest
-from gpt4docs import File, Project
+from gpt4docs import File, Project, PyDefinition, PyDefinitionTypeEnum
+from langchain.schema import BaseRetriever, Document
 from pathlib import Path
 import os
 
@@ -21,6 +22,57 @@ def project(project_root):
     return Project(project_root)
 
 
+class FakeRetriever(BaseRetriever):
+    """Retrieves the same document for every query"""
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return [Document(page_content="context")]
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None):
+        return self._get_relevant_documents(query)
+
+
+class FakeFile:
+    """File with the given definitions, without reading from disk"""
+
+    def __init__(self, definitions):
+        self.file_path = "test.py"
+        self.definitions = definitions
+
+    def get_docs(self):
+        return self.definitions
+
+
+@pytest.fixture
+def retriever():
+    return FakeRetriever()
+
+
+@pytest.fixture
+def make_file():
+    return FakeFile
+
+
+@pytest.fixture
+def make_definition():
+    def make(
+        qualified_name="test_func",
+        type=PyDefinitionTypeEnum.function,
+        source=None,
+        docstring=None,
+    ):
+        name = qualified_name.rpartition(".")[2]
+        return PyDefinition(
+            source=source or f"{type.value} {name}():",
+            type=type,
+            name=name,
+            qualified_name=qualified_name,
+            docstring=docstring,
+        )
+
+    return make
+
+
 # Clean up all files after each test
 @pytest.fixture(autouse=True)
 def teardown():
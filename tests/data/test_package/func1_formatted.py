@@ -6,23 +6,19 @@ def test_func():
 
 
 def test_func2():
-    """
-    This is a test function
+    """This is a test function
 
-    with multiple lines
-    """
+    with multiple lines"""
     a = 2
     return a
 
 
 class TestClass:
-    """
-    This is a test class
+    """This is a test class
     with
     other
     syntax
 
-
     """
 
     # Method with no docstring
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+
+from langchain.embeddings.base import Embeddings
+
+from gpt4docs.modules.cache import CachedEmbeddings, EmbeddingCache
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(text)), 0.5] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_memory_cache():
+    embeddings = CountingEmbeddings()
+    cached = CachedEmbeddings(embeddings)
+
+    assert cached.embed_documents(["a", "bb", "a"]) == [
+        [1.0, 0.5],
+        [2.0, 0.5],
+        [1.0, 0.5],
+    ]
+    assert cached.embed_documents(["bb"]) == [[2.0, 0.5]]
+    assert embeddings.texts == ["a", "bb"]
+
+
+def test_queries_and_documents_are_separate():
+    embeddings = CountingEmbeddings()
+    cached = CachedEmbeddings(embeddings)
+
+    cached.embed_documents(["a"])
+    cached.embed_query("a")
+    cached.embed_query("a")
+    assert embeddings.texts == ["a", "a"]
+
+
+def test_lru_size():
+    embeddings = CountingEmbeddings()
+    cached = CachedEmbeddings(embeddings, lru_size=1)
+
+    cached.embed_query("a")
+    cached.embed_query("b")
+    cached.embed_query("a")
+    assert embeddings.texts == ["a", "b", "a"]
+
+
+def test_store(tmp_path):
+    store = EmbeddingCache(tmp_path / "embeddings.sqlite")
+    CachedEmbeddings(CountingEmbeddings(), store=store).embed_documents(["a", "b"])
+
+    embeddings = CountingEmbeddings()
+    cached = CachedEmbeddings(embeddings, store=store)
+    assert cached.embed_documents(["a", "c"]) == [[1.0, 0.5], [1.0, 0.5]]
+    assert embeddings.texts == ["c"]
+    assert (cached.store_hits, cached.misses) == (1, 1)
+
+
+def test_async_embeds_in_thread():
+    embeddings = CountingEmbeddings()
+    cached = CachedEmbeddings(embeddings)
+    threads = []
+
+    def embed_documents(texts):
+        threads.append(threading.current_thread())
+        return CountingEmbeddings.embed_documents(embeddings, texts)
+
+    embeddings.embed_documents = embed_documents
+
+    async def run():
+        return await asyncio.gather(
+            cached.aembed_documents(["a", "bb"]), cached.aembed_query("ccc")
+        )
+
+    assert asyncio.run(run()) == [[[1.0, 0.5], [2.0, 0.5]], [3.0, 0.5]]
+    # The event loop is not blocked by the model
+    assert threading.main_thread() not in threads
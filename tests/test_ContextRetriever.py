@@ -0,0 +1,65 @@
+import asyncio
+
+from langchain.schema import BaseRetriever, Document
+
+from gpt4docs.modules.retrieval import ContextRetriever
+
+
+class CountingRetriever(BaseRetriever):
+    queries: list = []
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        self.queries.append(query)
+        return [Document(page_content=f"context {len(self.queries)}")]
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None):
+        return self._get_relevant_documents(query)
+
+
+def get_all(retriever, file):
+    async def get():
+        return await asyncio.gather(
+            *[
+                retriever.aget_documents(file, [definition])
+                for definition in file.definitions.values()
+            ]
+        )
+
+    return asyncio.run(get())
+
+
+def test_definition_scope(file):
+    retriever = CountingRetriever(queries=[])
+    get_all(ContextRetriever(retriever), file)
+    assert len(retriever.queries) == len(file.definitions)
+
+
+def test_file_scope(file):
+    retriever = CountingRetriever(queries=[])
+    documents = get_all(ContextRetriever(retriever, scope="file"), file)
+
+    assert len(retriever.queries) == 1
+    assert all(docs == documents[0] for docs in documents)
+
+
+def test_class_scope(file):
+    retriever = CountingRetriever(queries=[])
+    get_all(ContextRetriever(retriever, scope="class"), file)
+
+    scopes = {definition.scope for definition in file.definitions.values()}
+    assert len(retriever.queries) == len(scopes)
+
+
+def test_blend(file):
+    retriever = CountingRetriever(queries=[])
+    blend_retriever = CountingRetriever(queries=[])
+    context_retriever = ContextRetriever(
+        retriever, scope="file", blend_retriever=blend_retriever
+    )
+    documents = get_all(context_retriever, file)
+
+    assert len(blend_retriever.queries) == len(file.definitions)
+    assert [document.page_content for document in documents[1]] == [
+        "context 1",
+        "context 2",
+    ]
@@ -0,0 +1,98 @@
+from gpt4docs.modules.embeddings import HashingEmbeddings
+from gpt4docs.modules.managers import VectorStoreManager
+from gpt4docs.modules.parsing import DefinitionSplitter
+from gpt4docs.scripts.build_vectorstore import build_vectorstore
+
+CONTENT = '''import os
+
+
+def first():
+    return 1
+
+
+@property
+def second():
+    return 2
+
+
+class Third:
+    """Class"""
+
+    def method(self):
+        return 3
+
+    def other(self):
+        return 4
+'''
+
+
+def test_split_at_definitions():
+    documents = DefinitionSplitter().create_documents(
+        [CONTENT], [{"source": "package/module.py"}]
+    )
+
+    assert [document.metadata["name"] for document in documents] == [
+        "",
+        "first",
+        "second",
+        "Third",
+    ]
+    second = documents[2]
+    assert second.page_content.startswith("@property\ndef second():")
+    assert second.metadata["path"] == "package/module.py"
+    assert second.metadata["module"] == "package.module"
+    assert (second.metadata["start_line"], second.metadata["end_line"]) == (8, 10)
+
+
+def test_split_large_class():
+    spans = DefinitionSplitter(chunk_size=80, chunk_overlap=0).split_spans(CONTENT)
+
+    # The class is split at its methods, with its header in the first chunk
+    assert [name for name, _, _ in spans] == [
+        "",
+        "first",
+        "second",
+        "Third.method",
+        "Third.other",
+    ]
+    _, start, end = spans[3]
+    assert CONTENT[start:end].startswith('class Third:\n    """Class"""')
+    assert "".join(CONTENT[start:end] for _, start, end in spans) == CONTENT
+
+
+def test_split_conditional_definitions():
+    content = (
+        "def big():\n    return 1\n\n\n"
+        "if True:\n\n    def inner():\n        return 2\n"
+    )
+    documents = DefinitionSplitter().create_documents(
+        [content], [{"source": "module.py"}]
+    )
+
+    # The `if` and the definition in it are not part of `big`
+    assert [document.metadata["name"] for document in documents] == [
+        "big",
+        "",
+        "inner",
+    ]
+    big = documents[0]
+    assert (big.metadata["start_line"], big.metadata["end_line"]) == (1, 2)
+    assert "inner" not in big.page_content
+
+
+def test_module():
+    assert DefinitionSplitter.module("module.py") == "module"
+    assert DefinitionSplitter.module("package/__init__.py") == "package"
+
+
+def test_retriever_module_filter(tmp_path, project_root):
+    embeddings = HashingEmbeddings()
+    build_vectorstore(tmp_path / "vectorstore", project_root, embeddings=embeddings)
+
+    retriever = VectorStoreManager(
+        tmp_path / "vectorstore", embeddings=embeddings
+    ).get_retriever(k=4, search_kwargs={"filter": {"module": "time_manager"}})
+    documents = retriever.get_relevant_documents("WeatherManager")
+
+    assert len(documents) > 0
+    assert {document.metadata["path"] for document in documents} == {"time_manager.py"}
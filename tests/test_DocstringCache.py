@@ -0,0 +1,45 @@
+from langchain.schema import Document
+
+from gpt4docs.modules.cache import DocstringCache
+
+
+def test_get_set(tmp_path):
+    cache = DocstringCache(tmp_path / "cache.sqlite")
+    assert cache.get("key") is None
+
+    cache.set("key", "New docstring")
+    assert cache.get("key") == "New docstring"
+    assert cache.hits == 1 and cache.misses == 1
+
+
+def test_persistent(tmp_path):
+    cache = DocstringCache(tmp_path / "cache.sqlite")
+    cache.set("key", "New docstring")
+    cache.close()
+
+    assert DocstringCache(tmp_path / "cache.sqlite").get("key") == "New docstring"
+
+
+def test_eviction(tmp_path):
+    cache = DocstringCache(tmp_path / "cache.sqlite", max_size=10)
+    cache.set("first", "12345")
+    cache.set("second", "12345")
+    cache.get("first")
+    cache.set("third", "12345")
+
+    assert cache.get("second") is None
+    assert cache.get("first") == "12345"
+    assert cache.get("third") == "12345"
+    assert cache.size() == 10
+
+
+def test_key(make_definition):
+    documents = [Document(page_content="context", metadata={"doc_id": "1"})]
+    key = DocstringCache.key(make_definition(), "gpt-4", "prompt", documents)
+
+    assert key == DocstringCache.key(make_definition(), "gpt-4", "prompt", documents)
+    assert key != DocstringCache.key(
+        make_definition(source="def test_func(x):"), "gpt-4", "prompt", documents
+    )
+    assert key != DocstringCache.key(make_definition(), "gpt-4", "prompt", [])
+    assert key != DocstringCache.key(make_definition(), "gpt-4", "other", documents)
@@ -0,0 +1,46 @@
+from gpt4docs.modules.journal import DocstringJournal
+
+
+def test_resume(tmp_path, make_definition):
+    journal = DocstringJournal(tmp_path / "journal.jsonl")
+    journal.append("module.py", make_definition(docstring="New docstring"))
+    journal.close()
+
+    resumed = DocstringJournal(tmp_path / "journal.jsonl", resume=True)
+    definition = make_definition()
+    assert resumed.restore("module.py", definition)
+    assert definition.docstring == "New docstring"
+
+    # Changed definitions and other files are not restored
+    assert not resumed.restore("module.py", make_definition(source="def test_func(x):"))
+    assert not resumed.restore("other.py", make_definition())
+
+
+def test_without_resume_starts_over(tmp_path, make_definition):
+    journal = DocstringJournal(tmp_path / "journal.jsonl")
+    journal.append("module.py", make_definition(docstring="New docstring"))
+    journal.close()
+
+    assert len(DocstringJournal(tmp_path / "journal.jsonl")) == 0
+
+
+def test_incomplete_entry(tmp_path, make_definition):
+    journal = DocstringJournal(tmp_path / "journal.jsonl")
+    journal.append("module.py", make_definition(docstring="New docstring"))
+    journal.close()
+    with open(tmp_path / "journal.jsonl", "a") as f:
+        f.write('{"file": "module.py", "key": "cut')
+
+    resumed = DocstringJournal(tmp_path / "journal.jsonl", resume=True)
+    resumed.append("other.py", make_definition(docstring="Other docstring"))
+    resumed.close()
+
+    assert len(DocstringJournal(tmp_path / "journal.jsonl", resume=True)) == 2
+
+
+def test_clear(tmp_path, make_definition):
+    journal = DocstringJournal(tmp_path / "journal.jsonl")
+    journal.append("module.py", make_definition(docstring="New docstring"))
+    journal.clear()
+
+    assert not (tmp_path / "journal.jsonl").exists()
@@ -0,0 +1,32 @@
+from gpt4docs.modules.policies import DocstringPolicy
+
+import pytest
+
+
+LONG = "Return the sum of two numbers, rounded down."
+
+
+@pytest.mark.parametrize(
+    "mode, docstring, expected",
+    [
+        ("all", LONG, True),
+        ("missing", None, True),
+        ("missing", "  TODO  ", True),
+        ("missing", "Short", False),
+        ("short", "Short", True),
+        ("short", LONG, False),
+    ],
+)
+def test_should_generate(mode, docstring, expected, make_definition):
+    policy = DocstringPolicy(mode, min_length=30)
+    assert policy.should_generate(make_definition(docstring=docstring)) == expected
+
+
+def test_force(make_definition):
+    policy = DocstringPolicy("missing", force=True)
+    assert policy.should_generate(make_definition(docstring=LONG))
+
+
+def test_invalid_mode():
+    with pytest.raises(ValueError):
+        DocstringPolicy("some")
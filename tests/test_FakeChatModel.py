@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+from langchain.schema import HumanMessage
+
+from gpt4docs import DocstringLLM
+from gpt4docs.model import FakeChatModel, LLMBackend
+
+
+def make_llm(retriever, **kwargs):
+    return DocstringLLM(retriever=retriever, backend=LLMBackend("fake", **kwargs))
+
+
+def test_templated_docstring(monkeypatch, make_definition, retriever):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    llm = make_llm(retriever)
+
+    docstring = asyncio.run(llm.arun(make_definition("first"), documents=[]))
+    assert docstring == "Fake docstring for first."
+
+
+def test_templated_batch(make_definition, retriever):
+    llm = make_llm(retriever)
+    definitions = [make_definition("first"), make_definition("second")]
+
+    docstrings = asyncio.run(llm.arun_batch(definitions, documents=[]))
+    assert docstrings == ["Fake docstring for first.", "Fake docstring for second."]
+
+
+def test_replayed_responses():
+    model = FakeChatModel(responses=["a", "b"])
+    messages = [HumanMessage(content="prompt")]
+    assert [model.predict_messages(messages).content for _ in range(3)] == [
+        "a",
+        "b",
+        "a",
+    ]
+
+
+def test_latency():
+    async def run():
+        model = FakeChatModel(latency=0.1)
+        messages = [HumanMessage(content="prompt")]
+        await asyncio.gather(*[model.apredict_messages(messages) for _ in range(5)])
+
+    start = time.monotonic()
+    asyncio.run(run())
+    assert 0.1 <= time.monotonic() - start < 0.3
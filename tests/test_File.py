@@ -1,6 +1,8 @@
 from gpt4docs import File
 from gpt4docs import PyDefinition, PyDefinitionTypeEnum
+from gpt4docs.modules.parsing import DefinitionScanner
 from pathlib import Path
+import ast
 
 
 def test_init(file):
@@ -14,7 +16,7 @@ def test_scan_for_definitions(file):
     assert "test_func" in file.definitions
     assert "test_func2" in file.definitions
     assert "TestClass" in file.definitions
-    assert "no_docstring" in file.definitions
+    assert "TestClass.no_docstring" in file.definitions
 
     func1 = file.definitions["test_func"]
     assert isinstance(func1, PyDefinition)
@@ -31,9 +33,52 @@ def test_scan_for_definitions(file):
     assert func3.docstring == expected_docstring
     assert func3.type == "class"
 
-    func4 = file.definitions["no_docstring"]
+    func4 = file.definitions["TestClass.no_docstring"]
     assert func4.docstring is None
     assert func4.type == "def"
+    assert func4.name == "no_docstring"
+    assert func4.source == "    def no_docstring(self, x) -> None:"
+
+
+def test_scan_conditional_definitions():
+    content = (
+        "def a():\n"
+        '    x = """\n'
+        "not a statement\n"
+        '"""\n'
+        "    y = f(\n"
+        "1)\n"
+        "    def nested():\n"
+        "        pass\n"
+        "if True:\n"
+        "    def b():\n"
+        "        pass\n"
+        "class C:\n"
+        "    pass\n"
+        "try:\n"
+        "    class D:\n"
+        "        def m(self):\n"
+        "            pass\n"
+        "except ImportError:\n"
+        "    pass\n"
+    )
+    definitions = DefinitionScanner().scan(content)
+
+    # Statements at module level end the definitions before them, but lines
+    # in strings and brackets do not
+    assert list(definitions) == ["a", "a.nested", "b", "C", "D", "D.m"]
+
+
+def test_lazy(tmp_path):
+    p = tmp_path / "test.py"
+    p.write_text("def test_func():\n    pass\n")
+
+    file = File(p, lazy=True)
+    assert not file.loaded
+    assert file.stat.st_size == p.stat().st_size
+
+    assert list(file.definitions) == ["test_func"]
+    assert file.loaded
 
 
 def test_set_docstring(file):
@@ -255,7 +300,7 @@ def test_get_original_docs(file):
     assert "test_func" in original_docs
     assert "test_func2" in original_docs
     assert "TestClass" in original_docs
-    assert "no_docstring" in original_docs
+    assert "TestClass.no_docstring" in original_docs
 
 
 def test_str(file):
@@ -308,3 +353,115 @@ def test_indentation_level_preserved(tmp_path):
         '    New line 2\n    """\n    pass\n'
     )
     assert new_content == expected_content
+
+
+def test_scan_qualified_names(tmp_path):
+    p = tmp_path / "test.py"
+    p.write_text(
+        "class A:\n    def __init__(self):\n        pass\n\n\n"
+        "class B:\n    def __init__(self):\n        pass\n"
+    )
+    file = File(str(p))
+
+    assert list(file.definitions) == ["A", "A.__init__", "B", "B.__init__"]
+    assert file.definitions["B.__init__"].name == "__init__"
+
+
+def test_scan_spans(file):
+    definition = file.definitions["test_func2"]
+    assert definition.span.lineno == 6
+    assert definition.span.end_lineno == 6
+    assert file.content[definition.span.start : definition.span.end] == (
+        "def test_func2():"
+    )
+
+    docstring_span = definition.docstring_span
+    assert (docstring_span.lineno, docstring_span.end_lineno) == (7, 9)
+    assert file.content[docstring_span.start : docstring_span.end] == (
+        '"""This is a test function\n\n    with multiple lines"""'
+    )
+    assert file.definitions["TestClass.no_docstring"].docstring_span is None
+
+
+def test_scan_multiline_header(tmp_path):
+    p = tmp_path / "test.py"
+    p.write_text(
+        "async def test_func(\n    arg1: str = 'a:b',\n    arg2: dict = {1: 2},\n"
+        ") -> None:  # comment\n    '''Docstring'''\n"
+    )
+    file = File(str(p))
+
+    definition = file.definitions["test_func"]
+    assert definition.source.startswith("async def test_func(")
+    assert definition.source.endswith(") -> None:")
+    assert definition.docstring == "Docstring"
+
+
+def test_scan_ignores_strings_and_comments(tmp_path):
+    p = tmp_path / "test.py"
+    p.write_text(
+        'def test_func():\n    """Example:\n\n    def example():\n    """\n'
+        "    # def comment():\n    return 'class Fake:'\n"
+    )
+    file = File(str(p))
+
+    assert list(file.definitions) == ["test_func"]
+
+
+def test_save_same_method_names(tmp_path):
+    p = tmp_path / "test.py"
+    p.write_text(
+        "class A:\n    def __init__(self):\n        pass\n\n\n"
+        'class B:\n    def __init__(self):\n        """Old docstring"""\n'
+        "        pass\n"
+    )
+    file = File(str(p))
+    file.set_docstring("B.__init__", "New docstring")
+    file.set_docstring("A.__init__", "Other docstring")
+    file.save(overwrite=True)
+
+    assert p.read_text() == (
+        'class A:\n    def __init__(self):\n        """\n        Other docstring\n'
+        '        """\n        pass\n\n\nclass B:\n    def __init__(self):\n'
+        '        """\n        New docstring\n        """\n        pass\n'
+    )
+
+
+def test_save_keeps_unchanged_docstrings(tmp_path):
+    p = tmp_path / "test.py"
+    content = (
+        "def quoted():\n    '''Say \"\"\"hi\"\"\"'''\n    pass\n\n\n"
+        'def raw():\n    r"""Match \\d+"""\n    pass\n'
+    )
+    p.write_text(content)
+    file = File(str(p))
+    file.save(overwrite=True)
+
+    assert p.read_text() == content
+    ast.parse(p.read_text())
+
+
+def test_save_keeps_docstring_prefix_and_quotes(tmp_path):
+    p = tmp_path / "test.py"
+    p.write_text('def raw():\n    r"""Match \\d+"""\n    pass\n')
+    file = File(str(p))
+    file.set_docstring("raw", "Match \\d+ or \\w+")
+    file.save(overwrite=True)
+
+    assert p.read_text() == (
+        'def raw():\n    r"""\n    Match \\d+ or \\w+\n    """\n    pass\n'
+    )
+    assert ast.parse(p.read_text()).body[0].body[0].value.value.strip() == (
+        "Match \\d+ or \\w+"
+    )
+
+
+def test_save_docstring_with_quotes(tmp_path):
+    p = tmp_path / "test.py"
+    p.write_text('def quoted():\n    """Old docstring"""\n    pass\n')
+    file = File(str(p))
+    file.set_docstring("quoted", 'Say """hi"""')
+    file.save(overwrite=True)
+
+    module = ast.parse(p.read_text())
+    assert ast.get_docstring(module.body[0]) == 'Say """hi"""'
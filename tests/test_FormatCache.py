@@ -0,0 +1,37 @@
+import black
+
+from gpt4docs import File, Project
+from gpt4docs.modules.cache import FormatCache
+
+
+def test_format(tmp_path):
+    cache = FormatCache(tmp_path / "cache.sqlite")
+    mode = black.FileMode()
+
+    assert cache.format("x = ( 1 )", mode) == "x = 1\n"
+    assert cache.format("x = ( 1 )", mode) == "x = 1\n"
+    assert cache.hits == 1 and cache.misses == 1
+
+
+def test_key_depends_on_mode():
+    content = "x = ( 1 )"
+    assert FormatCache.key(content, black.FileMode()) != FormatCache.key(
+        content, black.FileMode(line_length=100)
+    )
+
+
+def test_file_uses_cache(tmp_path):
+    cache = FormatCache(tmp_path / "cache.sqlite")
+    File("tests/data/test.py", format_cache=cache)
+    file = File("tests/data/test.py", format_cache=cache)
+
+    assert cache.hits == 1
+    assert file.content == File("tests/data/test.py").content
+
+
+def test_project_counts_worker_hits(tmp_path, project_root):
+    cache = FormatCache(tmp_path / "cache.sqlite")
+    Project(project_root, workers=1, format_cache=cache)
+    Project(project_root, workers=2, format_cache=cache)
+
+    assert (cache.hits, cache.misses) == (8, 8)
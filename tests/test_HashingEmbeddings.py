@@ -0,0 +1,34 @@
+import math
+
+from gpt4docs.modules.embeddings import HashingEmbeddings, get_embeddings
+
+
+def test_deterministic_unit_vectors():
+    embeddings = HashingEmbeddings(size=64)
+    vector = embeddings.embed_query("def load_file(path): return open(path)")
+
+    assert len(vector) == 64
+    assert math.isclose(math.sqrt(sum(value * value for value in vector)), 1.0)
+    assert HashingEmbeddings(size=64).embed_query("def load_file(path):") == (
+        embeddings.embed_query("def load_file(path):")
+    )
+
+
+def test_similar_identifiers():
+    embeddings = HashingEmbeddings()
+    query, similar, other = embeddings.embed_documents(
+        ["WeatherManager", "weather_manager = 1", "class TimeZone: pass"]
+    )
+
+    def dot(a, b):
+        return sum(x * y for x, y in zip(a, b))
+
+    assert dot(query, similar) > dot(query, other)
+
+
+def test_empty_text():
+    assert HashingEmbeddings(size=8).embed_query("  ") == [0.0] * 8
+
+
+def test_get_embeddings():
+    assert isinstance(get_embeddings("hashing"), HashingEmbeddings)
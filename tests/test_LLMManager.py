@@ -0,0 +1,144 @@
+import asyncio
+
+import openai
+import pytest
+
+from gpt4docs import LLMManager, PyDefinitionTypeEnum
+from gpt4docs.modules.journal import DocstringJournal
+
+
+class FakeVectorStoreManager:
+    def __init__(self, retriever):
+        self.retriever = retriever
+
+    def get_retriever(self, k):
+        return self.retriever
+
+
+@pytest.fixture
+def manager(monkeypatch, retriever):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    manager = LLMManager(FakeVectorStoreManager(retriever), batch_size=2)
+
+    llm = manager.docstring_llm
+    monkeypatch.setattr(llm, "count_tokens", lambda definition, documents: 1)
+    monkeypatch.setattr(llm, "count_batch_tokens", lambda definitions, documents: 1)
+
+    async def arun(definition, documents=None):
+        return f"Single {definition.name}"
+
+    monkeypatch.setattr(llm, "arun", arun)
+    return manager
+
+
+def test_batches_by_class(manager, make_definition):
+    definitions = [
+        make_definition("A", PyDefinitionTypeEnum.class_),
+        make_definition("A.first"),
+        make_definition("A.second"),
+        make_definition("func"),
+    ]
+    batches = manager._batch([(None, definition) for definition in definitions])
+
+    assert [[d.key for d in batch] for _, batch in batches] == [
+        ["A", "A.first"],
+        ["A.second"],
+        ["func"],
+    ]
+
+
+def test_generate_batched(manager, monkeypatch, make_definition, make_file):
+    requests = []
+
+    async def arun_batch(definitions, documents):
+        requests.append(definitions)
+        return [f"Batched {definition.name}" for definition in definitions]
+
+    monkeypatch.setattr(manager.docstring_llm, "arun_batch", arun_batch)
+
+    file = make_file([make_definition("first"), make_definition("second")])
+    result = asyncio.run(manager.generate_docstrings([file]))
+
+    assert len(requests) == 1
+    assert [d.docstring for d in result[file]] == ["Batched first", "Batched second"]
+
+
+def test_generate_batched_fallback(manager, monkeypatch, make_definition, make_file):
+    async def arun_batch(definitions, documents):
+        raise ValueError("Invalid response")
+
+    monkeypatch.setattr(manager.docstring_llm, "arun_batch", arun_batch)
+
+    file = make_file([make_definition("first"), make_definition("second")])
+    result = asyncio.run(manager.generate_docstrings([file]))
+
+    assert [d.docstring for d in result[file]] == ["Single first", "Single second"]
+    assert manager.metrics.counters["batch_fallbacks"] == 1
+
+
+def test_generate_metrics(manager, make_definition, make_file):
+    file = make_file([make_definition("func")])
+    asyncio.run(manager.generate_docstrings([file]))
+
+    metrics = manager.metrics
+    assert metrics.definitions["test.py:func"]["prompt_tokens"] == 1
+    assert metrics.definitions["test.py:func"]["completion_tokens"] > 0
+    assert len(metrics.latencies["llm"]) == 1
+    assert len(metrics.latencies["retrieval"]) == 1
+    assert "llm" in metrics.files["test.py"]
+
+
+def test_generate_failure_keeps_file(manager, monkeypatch, make_definition, make_file):
+    manager.scheduler.max_retries = 0
+
+    async def arun(definition, documents=None):
+        if definition.name == "second":
+            raise openai.error.RateLimitError("Rate limited")
+        return f"Single {definition.name}"
+
+    monkeypatch.setattr(manager.docstring_llm, "arun", arun)
+    manager.batch_size = 1
+
+    file = make_file([make_definition("first"), make_definition("second")])
+    result = asyncio.run(manager.generate_docstrings([file]))
+
+    assert [d.docstring for d in result[file]] == ["Single first", None]
+    assert manager.metrics.counters["failed_docstrings"] == 1
+
+
+def test_generate_resume(manager, tmp_path, make_definition, make_file):
+    manager.journal = DocstringJournal(tmp_path / "journal.jsonl")
+    file = make_file([make_definition("first")])
+    asyncio.run(manager.generate_docstrings([file]))
+    manager.journal.close()
+
+    manager.journal = DocstringJournal(tmp_path / "journal.jsonl", resume=True)
+    file = make_file([make_definition("first"), make_definition("second")])
+    file.definitions[0].docstring = None
+    result = asyncio.run(manager.generate_docstrings([file]))
+
+    assert [d.docstring for d in result[file]] == ["Single first", "Single second"]
+    assert manager.metrics.counters["restored_docstrings"] == 1
+
+
+def test_generate_on_file_done(manager, make_definition, make_file):
+    files = [make_file([make_definition("first")]), make_file([])]
+    done = []
+
+    result = asyncio.run(manager.generate_docstrings(files, on_file_done=done.append))
+
+    assert result == {}
+    assert set(done) == set(files)
+    assert files[0].definitions[0].docstring == "Single first"
+
+
+def test_parse_batch_response(manager):
+    llm = manager.docstring_llm
+    response = '### 1\nFirst.\n\nArgs:\n    x: Value\n### 2\n"""Second"""\n'
+    assert llm._parse_batch_response(response, 2) == [
+        "First.\n\nArgs:\n    x: Value",
+        "Second",
+    ]
+
+    with pytest.raises(ValueError):
+        llm._parse_batch_response("### 1\nFirst\n", 2)
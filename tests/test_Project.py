@@ -1,5 +1,9 @@
-from gpt4docs import File, PyDefinition, PyDefinitionTypeEnum, Project
+from gpt4docs import File, PyDefinition, PyDefinitionTypeEnum, Project, ProjectManager
 from pathlib import Path
+import os
+import subprocess
+
+import pytest
 
 
 def test_project_init(project_root):
@@ -14,6 +18,41 @@ def test_project_files(project):
     assert isinstance(files[0], File)
 
 
+def test_project_workers(project_root):
+    serial = Project(project_root, workers=1)
+    parallel = Project(project_root, workers=2)
+
+    assert list(serial.files) == list(parallel.files)
+    for path, file in serial.files.items():
+        assert parallel.files[path].content == file.content
+        assert parallel.files[path].definitions == file.definitions
+
+
+def test_project_lazy(project_root):
+    project = Project(project_root, lazy=True)
+    assert len(project.files) == 8
+    assert not any(file.loaded for file in project.files.values())
+
+    project.load()
+    assert all(file.loaded for file in project.files.values())
+
+
+def test_project_load_keeps_files(project_root):
+    project = Project(project_root, workers=2, lazy=True)
+    files = dict(project.files)
+
+    # Files loaded by workers are the same objects as before
+    project.load()
+    assert all(project.files[path] is file for path, file in files.items())
+    assert all(file.loaded for file in files.values())
+    assert "test_func" in files["func1.py"].definitions
+
+
+def test_project_invalid_workers(project_root):
+    with pytest.raises(ValueError):
+        Project(project_root, workers=0)
+
+
 def test_project_save(tmp_path, project):
     new_doc = PyDefinition(
         source="def test_func():\n    pass",
@@ -77,3 +116,80 @@ def test_project_tree(project):
 │   ├── package1.py
 └──"""
     assert str(project) == expected_str
+
+
+def test_changed_since_time(tmp_path):
+    (tmp_path / "old.py").write_text("x = 1\n")
+    (tmp_path / "new.py").write_text("x = 2\n")
+    os.utime(tmp_path / "old.py", (1000, 1000))
+
+    project = Project(tmp_path, lazy=True)
+    assert project.changed_since_time(2000) == {"new.py"}
+
+
+def test_changed_since_ref(tmp_path):
+    def git(*args):
+        subprocess.run(["git", *args], cwd=tmp_path, check=True, capture_output=True)
+
+    git("init")
+    (tmp_path / "committed.py").write_text("x = 1\n")
+    (tmp_path / "changed.py").write_text("x = 1\n")
+    git("add", ".")
+    git("-c", "user.name=test", "-c", "user.email=test@test", "commit", "-m", "x")
+
+    (tmp_path / "changed.py").write_text("x = 2\n")
+    (tmp_path / "untracked.py").write_text("x = 3\n")
+
+    project = Project(tmp_path, lazy=True)
+    assert project.changed_since_ref("HEAD") == {"changed.py", "untracked.py"}
+
+    with pytest.raises(ValueError):
+        project.changed_since_ref("unknown-ref")
+
+
+def test_project_save_copies_unloaded(tmp_path, project_root):
+    manager = ProjectManager(project_root, lazy=True)
+    manager.select(["func1.py"])
+    assert [file.file_path.name for file in manager.get_files()] == ["func1.py"]
+
+    new_root = manager.project.save(suffix="_my_suffix")
+    for path, file in manager.project.files.items():
+        assert (new_root / path).exists()
+        assert file.loaded == (path == "func1.py")
+
+    # Unloaded files are copied without formatting
+    assert (new_root / "main.py").read_text() == (project_root / "main.py").read_text()
+
+
+def test_project_save_keeps_earlier_runs(tmp_path):
+    (tmp_path / "project").mkdir()
+    (tmp_path / "project" / "first.py").write_text("def first():\n    pass\n")
+    (tmp_path / "project" / "second.py").write_text("def second():\n    pass\n")
+    (tmp_path / "project_commented").mkdir()
+    commented = 'def first():\n    """Earlier docstring"""\n    pass\n'
+    (tmp_path / "project_commented" / "first.py").write_text(commented)
+
+    # Only second.py changed since the earlier run
+    project = Project(tmp_path / "project", lazy=True)
+    project.load(["second.py"])
+    new_root = project.save()
+
+    assert (new_root / "first.py").read_text() == commented
+    assert (new_root / "second.py").exists()
+
+
+def test_project_save_file(tmp_path):
+    (tmp_path / "project").mkdir()
+    (tmp_path / "project" / "first.py").write_text("def first():\n    pass\n")
+    (tmp_path / "project" / "second.py").write_text("def second():\n    pass\n")
+    project = Project(tmp_path / "project")
+
+    first = project.files["first.py"]
+    first.definitions["first"].docstring = "New docstring"
+    project.save_file(first)
+    assert not first.loaded
+
+    # Saved files are not saved again, which would lose their docstrings
+    new_root = project.save()
+    assert "New docstring" in (new_root / "first.py").read_text()
+    assert (new_root / "second.py").exists()
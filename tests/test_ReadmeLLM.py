@@ -0,0 +1,104 @@
+import asyncio
+
+import openai
+
+from gpt4docs.model import LLMBackend, ReadmeLLM
+from gpt4docs.modules.cache import SummaryCache
+
+
+def make_project(root):
+    (root / "package" / "sub").mkdir(parents=True)
+    (root / "main.py").write_text("def main():\n    pass\n")
+    (root / "package" / "__init__.py").write_text("")
+    (root / "package" / "module.py").write_text("def first():\n    pass\n")
+    (root / "package" / "sub" / "other.py").write_text("def second():\n    pass\n")
+
+
+def calls(llm):
+    return llm.model.calls + llm.reduce_llm.calls
+
+
+def test_tree(tmp_path):
+    make_project(tmp_path)
+    tree = ReadmeLLM(backend=LLMBackend("fake"))._tree(tmp_path)
+
+    assert list(tree) == ["main.py", "package"]
+    assert list(tree["package"]) == ["__init__.py", "module.py", "sub"]
+    assert tree["package"]["sub"]["other.py"] == tmp_path / "package/sub/other.py"
+
+
+def test_hierarchical_readme(tmp_path, retriever):
+    make_project(tmp_path)
+    llm = ReadmeLLM(backend=LLMBackend("fake"))
+
+    readme = asyncio.run(llm.arun(tmp_path, retriever=retriever))
+
+    assert readme.startswith("Fake response")
+    # 3 files and 1 retrieved document, 2 packages and the README. The empty
+    # __init__.py is skipped
+    assert llm.model.calls == 6
+    assert llm.reduce_llm.calls == 1
+
+
+def test_cached_summaries(tmp_path):
+    make_project(tmp_path)
+    cache = SummaryCache(tmp_path / "cache" / "summaries.sqlite")
+
+    llm = ReadmeLLM(backend=LLMBackend("fake"), summary_cache=cache)
+    first = asyncio.run(llm.arun(tmp_path))
+    assert calls(llm) == 6
+
+    # Unchanged projects are not summarized again
+    llm = ReadmeLLM(backend=LLMBackend("fake"), summary_cache=cache)
+    assert asyncio.run(llm.arun(tmp_path)) == first
+    assert calls(llm) == 0
+
+    # Only the changed file, its packages and the README are summarized
+    (tmp_path / "package" / "sub" / "other.py").write_text(
+        "def third(x):\n    return x\n"
+    )
+    llm = ReadmeLLM(backend=LLMBackend("fake"), summary_cache=cache)
+    asyncio.run(llm.arun(tmp_path))
+    assert calls(llm) == 4
+
+
+def test_failed_summary(tmp_path, monkeypatch):
+    make_project(tmp_path)
+    llm = ReadmeLLM(backend=LLMBackend("fake"))
+    run = llm._run
+
+    async def failing_run(chain, path, text):
+        if path == "package/module.py":
+            raise openai.error.InvalidRequestError("Too long", "messages")
+        return await run(chain, path, text)
+
+    monkeypatch.setattr(llm, "_run", failing_run)
+    readme = asyncio.run(llm.arun(tmp_path))
+
+    # The README is written from the summaries of the other files
+    assert readme.startswith("Fake response")
+    assert calls(llm) == 5
+
+
+def test_group():
+    llm = ReadmeLLM(backend=LLMBackend("fake"))
+    assert llm._group(["aaa", "bbb", "cc"], 8) == ["aaa\n\nbbb", "cc"]
+    assert llm._group(["aaaaaaaaaa"], 8) == ["aaaaaaaa"]
+
+
+def test_prefetch(tmp_path):
+    make_project(tmp_path)
+    llm = ReadmeLLM(backend=LLMBackend("fake"))
+
+    async def run():
+        llm.prefetch(tmp_path, tmp_path / "package" / "module.py")
+        return await llm.arun(tmp_path)
+
+    prefetched = asyncio.run(run())
+
+    # The prefetched summary is used instead of summarizing the file again
+    assert calls(llm) == 6
+    assert llm.prefetched == {}
+    assert prefetched == asyncio.run(
+        ReadmeLLM(backend=LLMBackend("fake")).arun(tmp_path)
+    )
@@ -0,0 +1,26 @@
+import asyncio
+
+from gpt4docs.model import LLMBackend, ReadmeLLM
+from gpt4docs.modules.embeddings import HashingEmbeddings
+from gpt4docs.modules.pipeline import ReadmePipeline
+
+
+def test_cancel(tmp_path):
+    (tmp_path / "project").mkdir()
+    (tmp_path / "project" / "module.py").write_text("def first():\n    pass\n")
+    llm = ReadmeLLM(backend=LLMBackend("fake", latency=10))
+    pipeline = ReadmePipeline(
+        llm, tmp_path / "project", tmp_path / "vectorstore", HashingEmbeddings()
+    )
+
+    async def run():
+        pipeline.start()
+        pipeline.add(tmp_path / "project" / "module.py")
+        prefetched = list(llm.prefetched.values())
+        await pipeline.cancel()
+        return prefetched + [pipeline._task]
+
+    # Summaries and embedding stop without waiting for the slow model
+    futures = asyncio.run(asyncio.wait_for(run(), timeout=5))
+    assert all(future.cancelled() for future in futures)
+    assert llm.prefetched == {}
@@ -0,0 +1,40 @@
+import json
+
+from gpt4docs.modules.metrics import RunMetrics
+
+
+def test_stage_adds_up():
+    metrics = RunMetrics()
+    with metrics.stage("save"):
+        pass
+    first = metrics.stages["save"]
+    with metrics.stage("save"):
+        pass
+    assert metrics.stages["save"] >= first
+
+
+def test_percentiles():
+    summary = RunMetrics.percentiles([float(i) for i in range(1, 101)])
+    assert summary["p50"] == 50
+    assert summary["p90"] == 90
+    assert summary["p99"] == 99
+    assert summary["max"] == 100
+    assert RunMetrics.percentiles([]) == {}
+
+
+def test_report(tmp_path):
+    metrics = RunMetrics()
+    metrics.add_file_time("a.py", "load", 1.0)
+    metrics.add_file_time("a.py", "load", 0.5)
+    metrics.add_latency("llm", 2.0)
+    metrics.add_definition("a.py:func", 100, 20)
+    metrics.add_definition("a.py:Class", 0, 0, cached=True)
+
+    metrics.save(tmp_path / "report.json", arguments={"path": tmp_path})
+    report = json.loads((tmp_path / "report.json").read_text())
+
+    assert report["arguments"] == {"path": str(tmp_path)}
+    assert report["files"] == {"a.py": {"load": 1.5}}
+    assert report["latencies"]["llm"]["count"] == 1
+    assert report["tokens"] == {"prompt": 100, "completion": 20}
+    assert report["counters"] == {"generated_docstrings": 1, "cached_docstrings": 1}
@@ -0,0 +1,137 @@
+import asyncio
+import time
+
+import openai
+import pytest
+
+from gpt4docs.modules.scheduling import AdaptiveLimiter, Scheduler, TokenBudget
+
+
+def test_map_keeps_order():
+    async def double(x):
+        await asyncio.sleep(0.01 * (5 - x))
+        return 2 * x
+
+    results = asyncio.run(Scheduler(concurrency=3).map(double, range(5)))
+    assert results == [0, 2, 4, 6, 8]
+
+
+def test_map_bounded_concurrency():
+    in_flight = 0
+    max_in_flight = 0
+
+    async def job(_):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+
+    asyncio.run(Scheduler(concurrency=4).map(job, range(20)))
+    assert max_in_flight == 4
+
+
+def test_map_empty():
+    async def job(_):
+        raise AssertionError("Should not be called")
+
+    assert asyncio.run(Scheduler().map(job, [])) == []
+
+
+def test_invalid_concurrency():
+    with pytest.raises(ValueError):
+        Scheduler(concurrency=0)
+
+
+def test_token_budget_waits():
+    # 10 tokens per second
+    budget = TokenBudget(tokens_per_minute=600)
+
+    async def spend():
+        await budget.acquire(600)
+        start = time.monotonic()
+        await budget.acquire(5)
+        return time.monotonic() - start
+
+    assert asyncio.run(spend()) >= 0.4
+
+
+def test_call_retries_rate_limits():
+    scheduler = Scheduler(concurrency=8, backoff=0.001)
+    attempts = 0
+
+    async def request(value):
+        nonlocal attempts
+        attempts += 1
+        if attempts < 3:
+            raise openai.error.RateLimitError("Rate limited")
+        return value
+
+    assert asyncio.run(scheduler.call(request, "done")) == "done"
+    assert scheduler.retries == 2
+    assert scheduler.limiter.limit < 8
+
+
+def test_call_raises_after_max_retries():
+    scheduler = Scheduler(max_retries=1, backoff=0.001)
+
+    async def request():
+        raise openai.error.APIError("Server error")
+
+    with pytest.raises(openai.error.APIError):
+        asyncio.run(scheduler.call(request))
+    assert scheduler.retries == 1
+
+
+def test_call_does_not_retry_other_errors():
+    scheduler = Scheduler(backoff=0.001)
+
+    async def request():
+        raise KeyError("Bug")
+
+    with pytest.raises(KeyError):
+        asyncio.run(scheduler.call(request))
+    assert scheduler.retries == 0
+
+
+def test_call_timeout():
+    scheduler = Scheduler(max_retries=0, timeout=0.01)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(scheduler.call(asyncio.sleep, 1))
+
+
+def test_adaptive_limiter():
+    limiter = AdaptiveLimiter(max_concurrency=8)
+
+    limiter.on_rate_limit(started=time.monotonic())
+    assert int(limiter.limit) == 4
+    # Requests sent before the decrease do not decrease it again
+    limiter.on_rate_limit(started=0)
+    assert int(limiter.limit) == 4
+
+    # About one more request in flight after each full limit of successes
+    for _ in range(5):
+        limiter.on_success()
+    assert int(limiter.limit) == 5
+    for _ in range(50):
+        limiter.on_success()
+    assert limiter.limit == 8
+
+
+def test_adaptive_limiter_bounds_in_flight():
+    limiter = AdaptiveLimiter(max_concurrency=4)
+    limiter.limit = 2
+    max_in_flight = 0
+
+    async def job():
+        nonlocal max_in_flight
+        async with limiter.slot():
+            max_in_flight = max(max_in_flight, limiter.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*(job() for _ in range(10)))
+
+    asyncio.run(run())
+    assert max_in_flight == 2
@@ -0,0 +1,229 @@
+import shutil
+import threading
+import time
+
+from langchain.embeddings.base import Embeddings
+from langchain.schema import Document
+from langchain.text_splitter import CharacterTextSplitter
+
+from gpt4docs.modules.embeddings import HashingEmbeddings
+from gpt4docs.modules.managers import VectorStoreManager
+from gpt4docs.scripts.build_vectorstore import (
+    add_documents,
+    build_vectorstore,
+    document_id,
+    load_manifest,
+    save_manifest,
+    scan_documents,
+    split_documents,
+    write_embeddings,
+)
+
+
+class SlowEmbeddings(Embeddings):
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.02)
+        with self.lock:
+            self.in_flight -= 1
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class CountingEmbeddings(HashingEmbeddings):
+    def __init__(self):
+        super().__init__()
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return super().embed_documents(texts)
+
+
+class FakeCollection:
+    def __init__(self):
+        self.upserts = []
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.upserts.append(list(zip(ids, embeddings, documents)))
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self._collection = FakeCollection()
+
+
+def test_scan_documents(project_root):
+    documents = scan_documents(project_root)
+    assert len(documents) == 8
+    assert "nested_package/test.py" in documents
+
+    content = (project_root / "func1.py").read_bytes()
+    assert documents["func1.py"] == document_id("func1.py", content)
+
+
+def test_scan_documents_skips_init(tmp_path):
+    (tmp_path / "__init__.py").write_text("")
+    (tmp_path / "module.py").write_text("x = 1\n")
+    assert list(scan_documents(tmp_path).keys()) == ["module.py"]
+
+
+def test_manifest_roundtrip(tmp_path):
+    assert load_manifest(tmp_path / "vectorstore") == {}
+
+    manifest = {"chunk_size": 2000, "files": {"module.py": "abc"}}
+    save_manifest(tmp_path / "vectorstore", manifest)
+    assert load_manifest(tmp_path / "vectorstore") == manifest
+
+
+def test_split_documents():
+    documents = [
+        Document(page_content="a\n\nbb\n\nccc", metadata={"doc_id": "x"}),
+        Document(page_content="dd", metadata={"doc_id": "y"}),
+    ]
+    splitter = CharacterTextSplitter(chunk_size=3, chunk_overlap=0)
+    chunks = list(split_documents([documents], splitter))
+
+    assert [chunk_id for chunk_id, _ in chunks] == ["x:0", "x:1", "x:2", "y:0"]
+    assert chunks[2][1].page_content == "ccc"
+
+
+def test_write_embeddings():
+    chunks = [(str(i), Document(page_content="a" * i)) for i in range(20)]
+    embeddings = SlowEmbeddings()
+    vectorstore = FakeVectorStore()
+
+    count = write_embeddings(
+        vectorstore, chunks, embeddings, batch_size=3, concurrency=4
+    )
+
+    assert count == 20
+    assert 1 < embeddings.max_in_flight <= 4
+    written = [row for upsert in vectorstore._collection.upserts for row in upsert]
+    assert written == [(str(i), [float(i)], "a" * i) for i in range(20)]
+
+
+def test_build_vectorstore_offline(tmp_path, project_root):
+    embeddings = HashingEmbeddings()
+    build_vectorstore(
+        tmp_path / "vectorstore", project_root, embeddings=embeddings, incremental=True
+    )
+
+    manifest = load_manifest(tmp_path / "vectorstore")
+    assert manifest["embeddings"] == embeddings.model
+    assert len(manifest["files"]) == 8
+
+    retriever = VectorStoreManager(
+        tmp_path / "vectorstore", embeddings=embeddings
+    ).get_retriever(k=2)
+    documents = retriever.get_relevant_documents("WeatherManager")
+    assert len(documents) == 2
+
+
+def test_add_documents(tmp_path, project_root):
+    embeddings = HashingEmbeddings()
+    vectorstore = tmp_path / "vectorstore"
+    add_documents(
+        vectorstore, project_root, [project_root / "func1.py"], embeddings=embeddings
+    )
+
+    manifest = load_manifest(vectorstore)
+    assert list(manifest["files"]) == ["func1.py"]
+
+    # An incremental build keeps the added file and embeds the others
+    build_vectorstore(
+        vectorstore, project_root, embeddings=embeddings, incremental=True
+    )
+    assert load_manifest(vectorstore)["files"] == scan_documents(project_root)
+
+
+def test_add_empty_documents(tmp_path, project_root):
+    vectorstore = tmp_path / "vectorstore"
+    empty = project_root / "nested_package" / "test.py"
+    add_documents(vectorstore, project_root, [empty], embeddings=HashingEmbeddings())
+
+    # Empty files have nothing to embed, but are not embedded again
+    assert list(load_manifest(vectorstore)["files"]) == ["nested_package/test.py"]
+
+
+def test_build_vectorstore_empty_changes(tmp_path):
+    (tmp_path / "project").mkdir()
+    (tmp_path / "project" / "a.py").write_text("def a():\n    pass\n")
+    vectorstore = tmp_path / "vectorstore"
+    embeddings = CountingEmbeddings()
+    build_vectorstore(vectorstore, tmp_path / "project", embeddings=embeddings)
+
+    # Only an empty file changed, so there is nothing to embed
+    (tmp_path / "project" / "b.py").write_text("")
+    embeddings.texts = []
+    for _ in range(2):
+        build_vectorstore(
+            vectorstore, tmp_path / "project", embeddings=embeddings, incremental=True
+        )
+
+    assert embeddings.texts == []
+    assert list(load_manifest(vectorstore)["files"]) == ["a.py", "b.py"]
+
+
+def test_build_vectorstore_moved_file(tmp_path):
+    (tmp_path / "project").mkdir()
+    (tmp_path / "project" / "old_name.py").write_text("def a():\n    pass\n")
+    (tmp_path / "project" / "copy.py").write_text("def a():\n    pass\n")
+    vectorstore = tmp_path / "vectorstore"
+    embeddings = HashingEmbeddings()
+    build_vectorstore(vectorstore, tmp_path / "project", embeddings=embeddings)
+
+    (tmp_path / "project" / "old_name.py").rename(tmp_path / "project" / "new_name.py")
+    build_vectorstore(
+        vectorstore, tmp_path / "project", embeddings=embeddings, incremental=True
+    )
+
+    # Moved files are embedded again with their new path, and files with the
+    # same content keep their own chunks
+    metadatas = VectorStoreManager(vectorstore, embeddings=embeddings).vectorstore.get(
+        include=["metadatas"]
+    )["metadatas"]
+    assert sorted(metadata["module"] for metadata in metadatas) == [
+        "copy",
+        "new_name",
+    ]
+
+
+def test_build_vectorstore_from_source(tmp_path, project_root):
+    embeddings = CountingEmbeddings()
+    build_vectorstore(tmp_path / "source", project_root, embeddings=embeddings)
+    source_count = len(embeddings.texts)
+
+    commented = tmp_path / "commented"
+    shutil.copytree(project_root, commented)
+    changed = commented / "func1.py"
+    changed.write_text(
+        changed.read_text().replace("This is a test function", "New docstring", 1)
+    )
+
+    embeddings.texts = []
+    build_vectorstore(
+        tmp_path / "vectorstore",
+        commented,
+        embeddings=embeddings,
+        source_directory=tmp_path / "source",
+    )
+
+    # Only the chunk of the changed definition is embedded, the others are
+    # copied
+    assert embeddings.texts == [
+        'def test_func():\n    """New docstring"""\n    pass\n\n\n'
+    ]
+    retriever = VectorStoreManager(
+        tmp_path / "vectorstore", embeddings=embeddings
+    ).get_retriever(k=source_count)
+    assert len(retriever.get_relevant_documents("WeatherManager")) == source_count
@@ -0,0 +1,23 @@
+import ast
+
+from gpt4docs.modules.directory import File
+from gpt4docs.scripts.generate_project import generate_project
+
+
+def test_generate_project(tmp_path):
+    paths = generate_project(tmp_path / "a", files=10, definitions=5, seed=1)
+    assert len(paths) == 10
+
+    for path in paths:
+        ast.parse(path.read_text())
+
+    other = generate_project(tmp_path / "b", files=10, definitions=5, seed=1)
+    assert [path.read_text() for path in paths] == [path.read_text() for path in other]
+
+
+def test_generate_project_docstring_ratio(tmp_path):
+    (path,) = generate_project(tmp_path / "none", files=1, docstring_ratio=0)
+    assert all(d.docstring is None for d in File(path).definitions.values())
+
+    (path,) = generate_project(tmp_path / "all", files=1, docstring_ratio=1)
+    assert all(d.docstring is not None for d in File(path).definitions.values())